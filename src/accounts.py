@@ -0,0 +1,153 @@
+import asyncio
+import logging
+
+import database as db
+
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+from database import session_maker
+from playerok import Playerok
+from credentials import Credentials, AccountCredentials
+from config import (
+    max_concurrent_requests,
+    read_rate_per_minute,
+    read_burst,
+    mutation_rate_per_minute,
+    mutation_burst,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """
+    One isolated Playerok client (session, caches, request budget) per
+    seller account. All clients share one worker thread pool, and the
+    global request budget is split evenly between accounts.
+    """
+
+    def __init__(self):
+        self.clients = {}
+        self.accounts = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_requests, thread_name_prefix="playerok"
+        )
+        self._lock = asyncio.Lock()
+
+    def get(self, account_pk: int) -> Playerok:
+        return self.clients.get(account_pk)
+
+    def new_client(self, account: db.Account = None) -> Playerok:
+        return Playerok(
+            credentials=AccountCredentials(account), executor=self.executor
+        )
+
+    async def load(self):
+        async with self._lock:
+            async with session_maker() as session:
+                accounts = (await session.execute(select(db.Account))).scalars().all()
+
+            if not accounts:
+                account = await self._import_legacy_account()
+                accounts = [account] if account else []
+
+            for account in accounts:
+                self._register(account)
+
+            self.rebalance()
+            logger.info(f"Loaded {len(self.clients)} Playerok accounts")
+
+    async def _import_legacy_account(self):
+        # single-account installs kept the session in src/storage
+        legacy = Credentials()
+        if not legacy.is_authorized or not legacy.user_id:
+            return None
+
+        logger.info(f"Importing account {legacy.username} from src/storage")
+        return await self._upsert(legacy.user_id, legacy.username, legacy.cookies)
+
+    async def _upsert(self, user_id: str, name: str, cookies: dict, email=None):
+        async with session_maker() as session:
+            account = (
+                await session.execute(
+                    select(db.Account).where(db.Account.user_id == user_id)
+                )
+            ).scalar_one_or_none()
+
+            if account is None:
+                account = db.Account(user_id=user_id, name=name, cookies=cookies)
+                session.add(account)
+            else:
+                account.name = name
+                account.cookies = cookies
+            if email:
+                account.email = email
+
+            await session.commit()
+            return account
+
+    def _register(self, account: db.Account):
+        self.accounts[account.pk] = account
+        self.clients[account.pk] = self.new_client(account)
+
+    async def sync(self, account_pk: int) -> Playerok:
+        """
+        Re-read one account in a worker process, where accounts are added
+        and re-authorized by the bot process. The client is only replaced
+        when the stored session has changed.
+        """
+        async with session_maker() as session:
+            account = await session.get(db.Account, account_pk)
+
+        async with self._lock:
+            if account is None:
+                self.accounts.pop(account_pk, None)
+                self.clients.pop(account_pk, None)
+                self.rebalance()
+                return None
+
+            known = self.accounts.get(account_pk)
+            if known is None or known.cookies != account.cookies:
+                self._register(account)
+                self.rebalance()
+            else:
+                self.accounts[account_pk] = account
+
+            return self.clients[account_pk]
+
+    async def save_login(self, client: Playerok, email: str = None) -> db.Account:
+        """
+        Store the session of a freshly authorized client and swap it into
+        the pool, replacing the previous session of the same account.
+        """
+        credentials = client.credentials
+        async with self._lock:
+            account = await self._upsert(
+                credentials.user_id, credentials.username, credentials.cookies, email
+            )
+            credentials.account_pk = account.pk
+            self.accounts[account.pk] = account
+            self.clients[account.pk] = client
+            self.rebalance()
+        return account
+
+    async def remove(self, account_pk: int):
+        async with self._lock:
+            async with session_maker() as session:
+                await db.orm_delete(session, db.Account, account_pk)
+            self.accounts.pop(account_pk, None)
+            self.clients.pop(account_pk, None)
+            self.rebalance()
+
+    def rebalance(self):
+        # the buckets are per process; in distributed mode the work queue
+        # keeps all running units of an account in one worker process
+        share = max(1, len(self.clients))
+        for client in self.clients.values():
+            client.read_bucket.rate = read_rate_per_minute / 60 / share
+            client.read_bucket.capacity = max(1, read_burst // share)
+            client.mutation_bucket.rate = mutation_rate_per_minute / 60 / share
+            client.mutation_bucket.capacity = max(1, mutation_burst // share)
+
+
+pool = ClientPool()
@@ -0,0 +1,171 @@
+"""
+End-to-end benchmark of the reupload and autolift jobs against the local
+stub GraphQL server (see stub_server.py).
+
+    python src/benchmark.py --sizes 16,500,5000 --latency 50
+
+Reports wall time, HTTP requests per cycle, p50/p95 request latency and
+peak Python memory for every catalog size.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import tempfile
+import tracemalloc
+
+from types import SimpleNamespace
+
+# the benchmark measures the pipeline, not the production request budget,
+# and must not touch the real database
+_workdir = tempfile.mkdtemp(prefix="playerok-bench-")
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{_workdir}/bench.sqlite")
+os.environ.setdefault("READ_RATE_PER_MINUTE", "600000")
+os.environ.setdefault("READ_BURST", "1000")
+os.environ.setdefault("MUTATION_RATE_PER_MINUTE", "600000")
+os.environ.setdefault("MUTATION_BURST", "1000")
+os.environ.setdefault("MAX_CONCURRENT_REQUESTS", "8")
+
+from database import create_db
+from credentials import Credentials
+from keywords import StaticKeywordStore
+from playerok import Playerok
+from notifier import Notifier
+from stub_server import StubServer, generate_catalog, KEYWORDS
+from utils import reupload_products, autolift_products
+
+logger = logging.getLogger(__name__)
+
+
+class BenchPlayerok(Playerok):
+    """
+    Playerok client that records the latency of every HTTP request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def _post(self, payload, headers=None):
+        started = time.perf_counter()
+        try:
+            return super()._post(payload, headers)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def _get(self, params):
+        started = time.perf_counter()
+        try:
+            return super()._get(params)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+class FakeBot:
+    """
+    Stands in for aiogram.Bot; returns messages carrying a file_id so the
+    notifier cache behaves as in production.
+    """
+
+    def __init__(self):
+        self.sent = 0
+
+    def _message(self):
+        self.sent += 1
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"file-{self.sent}")])
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        return self._message()
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        return [self._message() for _ in media]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return self._message()
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run_cycle(name: str, job, size: int, args) -> dict:
+    catalog = generate_catalog(size, user_id=f"bench-{name}-{size}")
+    server = StubServer(
+        catalog,
+        latency=args.latency / 1000,
+        error_rate=args.error_rate,
+        batching=not args.no_batching,
+    )
+    url = await server.start()
+
+    credentials = Credentials(tempfile.mkdtemp(dir=_workdir))
+    credentials.save({"stub": "1"}, {"id": f"bench-{size}", "username": "bench"})
+    playerok = BenchPlayerok(url=url, credentials=credentials)
+    keywords = StaticKeywordStore([(keyword, 100) for keyword in KEYWORDS])
+    bot = FakeBot()
+    notifier = Notifier(rate_per_second=1000, chat_interval=0, digest_window=0.05)
+    notifier.start(bot)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        await job(playerok, keywords, notifier, ["1"])
+    finally:
+        wall_time = time.perf_counter() - started
+        await notifier.stop()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await server.stop()
+        playerok.executor.shutdown(wait=False)
+
+    return {
+        "job": name,
+        "items": size,
+        "wall_s": wall_time,
+        "requests": sum(server.requests.values()),
+        "operations": dict(server.operations),
+        "p50_ms": percentile(playerok.latencies, 0.50) * 1000,
+        "p95_ms": percentile(playerok.latencies, 0.95) * 1000,
+        "peak_mb": peak / 1024 / 1024,
+        "notifications": bot.sent,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="16,500,5000")
+    parser.add_argument("--latency", type=float, default=50, help="mean latency, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-batching", action="store_true")
+    parser.add_argument("--jobs", default="reupload,autolift")
+    args = parser.parse_args()
+
+    await create_db()
+
+    jobs = {"reupload": reupload_products, "autolift": autolift_products}
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        for name in args.jobs.split(","):
+            results.append(await run_cycle(name, jobs[name], size, args))
+
+    header = f"{'job':<9} {'items':>6} {'wall s':>8} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'peak MB':>8} {'sent':>5}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['job']:<9} {result['items']:>6} {result['wall_s']:>8.2f} "
+            f"{result['requests']:>9} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+            f"{result['peak_mb']:>8.2f} {result['notifications']:>5}"
+        )
+    for result in results:
+        print(f"{result['job']} {result['items']}: {result['operations']}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker. After `threshold` consecutive
+    failures it opens for an exponentially growing, jittered delay; then
+    a single probe request is let through and its result either closes
+    the breaker or opens it again for longer.
+    """
+
+    def __init__(self, name: str, threshold: int, base_delay: float, max_delay: float):
+        self.name = name
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """
+        True while requests are refused: open and not yet due for a probe,
+        or half-open with the probe still in flight.
+        """
+        if self.state == "open":
+            return time.monotonic() < self.open_until
+        return self.state == "half_open" and self._probing
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self.open_until - time.monotonic()) if self.is_open else 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+
+        if self.state == "open":
+            if time.monotonic() < self.open_until:
+                return False
+            self.state = "half_open"
+            self._probing = False
+            logger.info(f"Circuit {self.name} half-open, sending a probe")
+
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def abandon(self):
+        # the probe was cancelled before it got an answer
+        self._probing = False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit {self.name} closed")
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self._open()
+
+    def _open(self):
+        self.trips += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.trips - 1))
+        delay *= random.uniform(0.5, 1.5)
+        self.state = "open"
+        self.open_until = time.monotonic() + delay
+        self.failures = 0
+        self._probing = False
+        logger.warning(
+            f"Circuit {self.name} open for {delay:.0f} seconds (trip {self.trips})"
+        )
@@ -0,0 +1,90 @@
+import logging
+
+import database as db
+
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from database import session_maker
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+class SpendBudget:
+    """
+    Per-account spending limit for paid mutations over a rolling hour or
+    day. Limits live in the autolift_budget table and every confirmed
+    mutation is written to the spend table, so all processes share them.
+    """
+
+    async def get(self, account_pk: int):
+        if account_pk is None:
+            return None
+        async with session_maker() as session:
+            return await session.scalar(
+                select(db.AutoliftBudget).where(
+                    db.AutoliftBudget.account_pk == account_pk
+                )
+            )
+
+    async def set(self, account_pk: int, amount: int, period: str = "day"):
+        async with session_maker() as session:
+            budget = await session.scalar(
+                select(db.AutoliftBudget).where(
+                    db.AutoliftBudget.account_pk == account_pk
+                )
+            )
+            if budget is None:
+                budget = db.AutoliftBudget(account_pk=account_pk)
+                session.add(budget)
+            budget.amount = amount
+            budget.period = period
+            await session.commit()
+
+    async def clear(self, account_pk: int):
+        budget = await self.get(account_pk)
+        if budget:
+            async with session_maker() as session:
+                await db.orm_delete(session, db.AutoliftBudget, budget.pk)
+
+    async def spent(self, account_pk: int, period: str = "day") -> int:
+        since = datetime.utcnow() - PERIODS[period]
+        async with session_maker() as session:
+            total = await session.scalar(
+                select(func.sum(db.Spend.amount)).where(
+                    db.Spend.account_pk == account_pk,
+                    db.Spend.at >= since,
+                )
+            )
+        return total or 0
+
+    async def remaining(self, account_pk: int):
+        """
+        Return what is left of the account's budget in the current period,
+        or None when the account has no limit.
+        """
+        budget = await self.get(account_pk)
+        if budget is None:
+            return None
+        return max(0, budget.amount - await self.spent(account_pk, budget.period))
+
+    async def record(self, account_pk: int, item_id: str, action: str, amount: int):
+        async with session_maker() as session:
+            await db.orm_create(
+                session,
+                db.Spend,
+                {
+                    "account_pk": account_pk,
+                    "item_id": item_id,
+                    "action": action,
+                    "amount": amount,
+                    "at": datetime.utcnow(),
+                },
+            )
+
+
+spend_budget = SpendBudget()
@@ -0,0 +1,88 @@
+import time
+import asyncio
+
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Expiring key/value cache with single-flight loading: concurrent
+    get_or_load() calls for the same key share one loader call. With
+    maxsize set, the least recently used entries are evicted first.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._stale = set()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if self.maxsize and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """
+        Drop entries whose key matches predicate, or everything. Loads
+        already in flight for those keys will not store their result.
+        """
+        for key in self._inflight:
+            if predicate is None or predicate(key):
+                self._stale.add(key)
+
+        if predicate is None:
+            self._data.clear()
+            return
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def discard(self, key):
+        """
+        Drop one entry; a load in flight for it will not store its result.
+        """
+        if key in self._inflight:
+            self._stale.add(key)
+        self._data.pop(key, None)
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield so that one cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader()
+        finally:
+            stale = key in self._stale
+            self._stale.discard(key)
+
+        if value is not None and not stale:
+            self.set(key, value)
+        return value
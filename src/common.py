@@ -3,6 +3,7 @@ from aiogram import Bot
 
 private = [
     BotCommand(command="start", description="Панель"),
+    BotCommand(command="stats", description="Статистика циклів"),
 ]
 
 
@@ -9,3 +9,38 @@ db_url = os.getenv("DB_URL")
 token = os.getenv("TOKEN")
 admin_list = os.getenv("ADMIN_LIST", "").strip()
 site_url = os.getenv("SITE_URL")
+graphql_url = os.getenv("GRAPHQL_URL", "https://playerok.com/graphql")
+request_timeout = float(os.getenv("REQUEST_TIMEOUT", 30))
+max_concurrent_requests = int(os.getenv("MAX_CONCURRENT_REQUESTS", 4))
+read_rate_per_minute = float(os.getenv("READ_RATE_PER_MINUTE", 12))
+read_burst = int(os.getenv("READ_BURST", 4))
+mutation_rate_per_minute = float(os.getenv("MUTATION_RATE_PER_MINUTE", 4))
+mutation_burst = int(os.getenv("MUTATION_BURST", 2))
+processed_item_cooldown_hours = float(os.getenv("PROCESSED_ITEM_COOLDOWN_HOURS", 6))
+misfire_grace_time = int(os.getenv("MISFIRE_GRACE_TIME", 60))
+listing_cache_ttl = float(os.getenv("LISTING_CACHE_TTL", 60))
+quote_cache_ttl = float(os.getenv("QUOTE_CACHE_TTL", 900))
+quote_cache_size = int(os.getenv("QUOTE_CACHE_SIZE", 1000))
+priority_batch_size = int(os.getenv("PRIORITY_BATCH_SIZE", 16))
+notify_rate_per_second = float(os.getenv("NOTIFY_RATE_PER_SECOND", 25))
+notify_chat_interval = float(os.getenv("NOTIFY_CHAT_INTERVAL", 1))
+notify_digest_threshold = int(os.getenv("NOTIFY_DIGEST_THRESHOLD", 4))
+notify_digest_window = float(os.getenv("NOTIFY_DIGEST_WINDOW", 60))
+distributed_jobs = os.getenv("DISTRIBUTED_JOBS", "false").lower() in ("1", "true", "yes")
+work_lease_seconds = float(os.getenv("WORK_LEASE_SECONDS", 120))
+work_max_attempts = int(os.getenv("WORK_MAX_ATTEMPTS", 3))
+worker_concurrency = int(os.getenv("WORKER_CONCURRENCY", 2))
+worker_poll_interval = float(os.getenv("WORKER_POLL_INTERVAL", 5))
+metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+metrics_port = int(os.getenv("METRICS_PORT", 9108))
+worker_metrics_port = int(os.getenv("WORKER_METRICS_PORT", 9110))
+stats_cycles = int(os.getenv("STATS_CYCLES", 10))
+log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+log_levels = os.getenv("LOG_LEVELS", "")
+log_max_bytes = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+log_backup_count = int(os.getenv("LOG_BACKUP_COUNT", 5))
+log_max_message = int(os.getenv("LOG_MAX_MESSAGE", 2000))
+breaker_failure_threshold = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 3))
+endpoint_breaker_threshold = int(os.getenv("ENDPOINT_BREAKER_THRESHOLD", 6))
+breaker_base_delay = float(os.getenv("BREAKER_BASE_DELAY", 30))
+breaker_max_delay = float(os.getenv("BREAKER_MAX_DELAY", 600))
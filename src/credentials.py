@@ -0,0 +1,180 @@
+import os
+import ast
+import json
+import time
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path: str, content: str):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+class Credentials:
+    """
+    Playerok session state (cookies, user data and the request counter).
+    Loaded from src/storage once, kept in memory and written back
+    atomically only when it changes.
+    """
+
+    def __init__(
+        self,
+        storage_path: str = "src/storage",
+        checkpoint_every: int = 5,
+        checkpoint_interval: float = 60,
+    ):
+        self.cookies_path = os.path.join(storage_path, "cookies.txt")
+        self.user_data_path = os.path.join(storage_path, "user_data.json")
+        self.counter_path = os.path.join(storage_path, "count.txt")
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+
+        self.cookies = {}
+        self.user_data = {}
+        self.request_count = 0
+        self._saved_count = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.RLock()
+
+        self.load()
+
+    def load(self):
+        with self._lock:
+            if os.path.exists(self.cookies_path):
+                with open(self.cookies_path, "r") as f:
+                    for line in f:
+                        key, _, value = line.strip().partition("=")
+                        if key:
+                            self.cookies[key] = value
+
+            if os.path.exists(self.user_data_path):
+                with open(self.user_data_path, "r") as f:
+                    self.user_data = self._parse_user_data(f.read())
+
+            if os.path.exists(self.counter_path):
+                with open(self.counter_path, "r") as f:
+                    content = f.read().strip()
+                    self.request_count = int(content) if content.isdigit() else 0
+                    self._saved_count = self.request_count
+
+    def _parse_user_data(self, content: str) -> dict:
+        content = content.strip()
+        if not content:
+            logger.error("User data file is empty.")
+            return {}
+
+        try:
+            return json.loads(content)
+        except ValueError:
+            # older versions wrote str(dict), which is not valid JSON
+            user_data = ast.literal_eval(content)
+            atomic_write(self.user_data_path, json.dumps(user_data))
+            return user_data
+
+    @property
+    def is_authorized(self) -> bool:
+        return bool(self.cookies)
+
+    @property
+    def user_id(self):
+        return self.user_data.get("id")
+
+    @property
+    def username(self):
+        return self.user_data.get("username")
+
+    @property
+    def cookie_header(self) -> str:
+        return "; ".join(f"{key}={value}" for key, value in self.cookies.items())
+
+    def save(self, cookies: dict, user_data: dict):
+        with self._lock:
+            self.cookies = dict(cookies)
+            self.user_data = dict(user_data)
+            atomic_write(
+                self.cookies_path,
+                "".join(f"{key}={value}\n" for key, value in self.cookies.items()),
+            )
+            atomic_write(self.user_data_path, json.dumps(self.user_data))
+
+    def clear(self):
+        with self._lock:
+            self.cookies = {}
+            self.user_data = {}
+            for path in (self.cookies_path, self.user_data_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def increment_requests(self) -> int:
+        with self._lock:
+            self.request_count += 1
+            if (
+                self.request_count - self._saved_count >= self.checkpoint_every
+                or time.monotonic() - self._saved_at >= self.checkpoint_interval
+            ):
+                self.checkpoint()
+            return self.request_count
+
+    def reset_requests(self):
+        with self._lock:
+            self.request_count = 0
+            self.checkpoint()
+
+    def checkpoint(self):
+        with self._lock:
+            atomic_write(self.counter_path, str(self.request_count))
+            self._saved_count = self.request_count
+            self._saved_at = time.monotonic()
+
+
+class AccountCredentials(Credentials):
+    """
+    Credentials of a database Account. Changes are kept in memory and
+    written to the account row by accounts.ClientPool.
+    """
+
+    def __init__(self, account=None):
+        self.account_pk = account.pk if account else None
+        self.cookies = dict(account.cookies or {}) if account else {}
+        self.user_data = (
+            {"id": account.user_id, "username": account.name} if account else {}
+        )
+        self.request_count = 0
+        self._lock = threading.RLock()
+
+    def load(self):
+        pass
+
+    def save(self, cookies: dict, user_data: dict):
+        with self._lock:
+            self.cookies = dict(cookies)
+            self.user_data = dict(user_data)
+
+    def clear(self):
+        with self._lock:
+            self.cookies = {}
+            self.user_data = {}
+
+    def increment_requests(self) -> int:
+        with self._lock:
+            self.request_count += 1
+            return self.request_count
+
+    def reset_requests(self):
+        with self._lock:
+            self.request_count = 0
+
+    def checkpoint(self):
+        pass
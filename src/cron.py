@@ -1,3 +1,22 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from sqlalchemy.engine import make_url
+from config import db_url, misfire_grace_time
 
-scheduler = AsyncIOScheduler()
+
+def sync_db_url(url: str) -> str:
+    # the job store uses a synchronous engine, so drop the async driver
+    url = make_url(url)
+    return url.set(drivername=url.drivername.split("+")[0]).render_as_string(
+        hide_password=False
+    )
+
+
+scheduler = AsyncIOScheduler(
+    jobstores={"default": SQLAlchemyJobStore(url=sync_db_url(db_url))},
+    job_defaults={
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": misfire_grace_time,
+    },
+)
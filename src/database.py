@@ -5,7 +5,7 @@ from sqlalchemy import select, update, delete, JSON
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy import DateTime, String, func
+from sqlalchemy import DateTime, Index, String, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from config import db_url
 
@@ -56,6 +56,84 @@ class AutoliftKeyword(Base):
     keyword: Mapped[str] = mapped_column(String(1024), unique=True)
     position: Mapped[int] = mapped_column()
 
+
+class Account(Base):
+    __tablename__ = "account"
+
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(100), unique=True)
+    name: Mapped[str] = mapped_column(String(100))
+    email: Mapped[str] = mapped_column(String(255), nullable=True)
+    cookies: Mapped[dict] = mapped_column(JSON, default=dict)
+    reupload_interval: Mapped[int] = mapped_column(default=3)
+    autolift_interval: Mapped[int] = mapped_column(default=5)
+
+
+class ProcessedItem(Base):
+    __tablename__ = "processed_item"
+    __table_args__ = (Index("ix_processed_item_item_id_action", "item_id", "action"),)
+
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    item_id: Mapped[str] = mapped_column(String(100))
+    action: Mapped[str] = mapped_column(String(50))
+    result: Mapped[str] = mapped_column(String(50))
+    at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+    price: Mapped[int] = mapped_column(nullable=True)
+
+
+class WorkUnit(Base):
+    __tablename__ = "work_unit"
+    __table_args__ = (Index("ix_work_unit_status", "status"),)
+
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    account_pk: Mapped[int] = mapped_column()
+    kind: Mapped[str] = mapped_column(String(50))
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    lease_owner: Mapped[str] = mapped_column(String(100), nullable=True)
+    lease_until: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(default=0)
+    result: Mapped[str] = mapped_column(String(255), nullable=True)
+    finished: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+
+class Mutation(Base):
+    __tablename__ = "mutation"
+    __table_args__ = (Index("ix_mutation_state", "state"),)
+
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    item_id: Mapped[str] = mapped_column(String(100))
+    slug: Mapped[str] = mapped_column(String(255))
+    action: Mapped[str] = mapped_column(String(50))
+    priority_status_id: Mapped[str] = mapped_column(String(100))
+    state: Mapped[str] = mapped_column(String(20), default="pending")
+    status_before: Mapped[str] = mapped_column(String(50), nullable=True)
+    position_before: Mapped[int] = mapped_column(nullable=True)
+    account_pk: Mapped[int] = mapped_column(nullable=True)
+    cost: Mapped[int] = mapped_column(nullable=True)
+    finished: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+
+class AutoliftBudget(Base):
+    __tablename__ = "autolift_budget"
+
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    account_pk: Mapped[int] = mapped_column(unique=True)
+    amount: Mapped[int] = mapped_column()
+    period: Mapped[str] = mapped_column(String(10), default="day")
+
+
+class Spend(Base):
+    __tablename__ = "spend"
+    __table_args__ = (Index("ix_spend_account_pk_at", "account_pk", "at"),)
+
+    pk: Mapped[int] = mapped_column(primary_key=True)
+    account_pk: Mapped[int] = mapped_column(nullable=True)
+    item_id: Mapped[str] = mapped_column(String(100))
+    action: Mapped[str] = mapped_column(String(50))
+    amount: Mapped[int] = mapped_column()
+    at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+
+
 async def orm_create(session: AsyncSession, model: object, data: dict):
     try:
         obj = model(**data)
@@ -1,4 +1,3 @@
-import os
 import traceback
 import logging
 
@@ -13,37 +12,114 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from filters import IsAdmin
 from keyboards import get_callback_btns
-from playerok import Playerok
-from utils import reupload_products, autolift_products
-from config import admin_list
+from keywords import parser_keyword_store, autolift_keyword_store
+from accounts import pool
+from budget import spend_budget
+from jobs import (
+    reupload_job_id,
+    autolift_job_id,
+    schedule_reupload,
+    schedule_autolift,
+    unschedule,
+)
 from cron import scheduler
+from metrics import metrics
+from config import stats_cycles, distributed_jobs
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 router.message.filter(IsAdmin())
 
-playerok = Playerok()
-
 
 def panel_keyboard() -> dict:
-    panel_buttons = {
-        "🔐 Авторизація 🔐": "auth",
-        "✏️ Редагувати ключові слова для парсера ✏️": "edit_keywords",
-        "✏️ Редагувати ключові слова для автопідняття ✏️": "edit_autolift_keywords",
-    }
-
-    if scheduler.get_job("reupload_products_job"):
-        panel_buttons.update({"⛔ Вимкнути парсер ⛔": "disable_parser"})
+    panel_buttons = {}
+    for account in pool.accounts.values():
+        panel_buttons[f"👤 {account.name}"] = f"account_{account.pk}"
+
+    panel_buttons.update(
+        {
+            "🔐 Додати аккаунт 🔐": "auth",
+            "✏️ Редагувати ключові слова для парсера ✏️": "edit_keywords",
+            "✏️ Редагувати ключові слова для автопідняття ✏️": "edit_autolift_keywords",
+        }
+    )
+
+    return panel_buttons
+
+
+def playerok_state(account_pk: int) -> str:
+    if distributed_jobs:
+        # the requests go out from the worker processes, the bot's own
+        # clients know nothing about their breakers
+        return "ℹ️ Стан Playerok недоступний у розподіленому режимі (див. метрики воркерів)"
+
+    client = pool.get(account_pk)
+    breakers = client.open_breakers() if client else []
+    if not breakers:
+        return "✅ Playerok доступний"
+
+    details = ", ".join(
+        f"{breaker.name} (ще {breaker.retry_in:.0f} с)" for breaker in breakers
+    )
+    return f"⛔ Playerok недоступний: {details}"
+
+
+PERIOD_NAMES = {"hour": "годину", "day": "день"}
+
+
+async def budget_text(account_pk: int) -> str:
+    budget = await spend_budget.get(account_pk)
+    if not budget:
+        return "Бюджет автопідняття: без ліміту"
+
+    spent = await spend_budget.spent(account_pk, budget.period)
+    return (
+        f"Бюджет автопідняття: {budget.amount} на {PERIOD_NAMES[budget.period]} "
+        f"(витрачено {spent})"
+    )
+
+
+def panel_text() -> str:
+    message_text = "⚙️ Панель управління"
+    if distributed_jobs:
+        return message_text
+
+    for account in pool.accounts.values():
+        client = pool.get(account.pk)
+        if client and client.unavailable:
+            message_text += f"\n⛔ {account.name}: Playerok недоступний"
+    return message_text
+
+
+def account_keyboard(account_pk: int) -> dict:
+    account_buttons = {}
+
+    if scheduler.get_job(reupload_job_id(account_pk)):
+        account_buttons.update({"⛔ Вимкнути парсер ⛔": f"disable_parser_{account_pk}"})
     else:
-        panel_buttons.update({"▶️ Увімкнути парсер ▶️": "enable_parser"})
+        account_buttons.update(
+            {"▶️ Увімкнути парсер ▶️": f"enable_parser_{account_pk}"}
+        )
 
-    if scheduler.get_job("autolift_job"):
-        panel_buttons.update({"⛔ Вимкнути автопідняття ⛔": "disable_autolift"})
+    if scheduler.get_job(autolift_job_id(account_pk)):
+        account_buttons.update(
+            {"⛔ Вимкнути автопідняття ⛔": f"disable_autolift_{account_pk}"}
+        )
     else:
-        panel_buttons.update({"▶️ Увімкнути автопідняття ▶️": "enable_autolift"})
+        account_buttons.update(
+            {"▶️ Увімкнути автопідняття ▶️": f"enable_autolift_{account_pk}"}
+        )
 
-    return panel_buttons
+    account_buttons.update(
+        {
+            "💰 Бюджет автопідняття 💰": f"budget_{account_pk}",
+            "🗑 Видалити аккаунт 🗑": f"delete_account_{account_pk}",
+            "⬅️ Назад": "panel",
+        }
+    )
+
+    return account_buttons
 
 
 @router.message(CommandStart())
@@ -67,7 +143,7 @@ async def panel(message: Message, state: FSMContext, session: AsyncSession):
                 )
 
         await message.answer(
-            "⚙️ Панель управління",
+            panel_text(),
             reply_markup=get_callback_btns(btns=panel_keyboard(), sizes=(1,)),
         )
     except Exception as e:
@@ -76,12 +152,89 @@ async def panel(message: Message, state: FSMContext, session: AsyncSession):
         await message.answer("Виникла помилка 😞...")
 
 
+PHASE_NAMES = {
+    "fetch": "отримання",
+    "match": "пошук",
+    "quote": "котирування",
+    "mutate": "зміни",
+    "notify": "сповіщення",
+    "throttle": "ліміт",
+}
+
+SKIP_REASONS = {
+    "overlap": "попередній ще виконувався",
+    "missed": "пропущено планувальником",
+    "queued": "попередній ще в черзі",
+    "circuit_open": "Playerok недоступний",
+}
+
+
+def format_skips() -> str:
+    skips = metrics.skips_summary()
+    if not skips:
+        return ""
+
+    message_text = "\n<b>Пропущені запуски</b>\n"
+    for (job, reason), count in sorted(skips.items()):
+        message_text += f"{job}, {SKIP_REASONS.get(reason, reason)}: {count:g}\n"
+    return message_text
+
+
+def format_stats(count: int) -> str:
+    # only what ran in the bot process; workers export their own /metrics
+    scope = (
+        "\n<i>Лише процес бота: у розподіленому режимі цикли виконують воркери, "
+        "див. їхні /metrics.</i>"
+        if distributed_jobs
+        else ""
+    )
+    cycles = list(metrics.cycles)[-count:]
+    if not cycles:
+        return f"📊 Ще не було жодного циклу.\n{format_skips()}{scope}"
+
+    message_text = f"📊 Останні цикли ({len(cycles)})\n"
+    for cycle in reversed(cycles):
+        phases = ", ".join(
+            f"{PHASE_NAMES.get(phase, phase)} {seconds:.1f} с"
+            for phase, seconds in cycle.phases.most_common()
+        )
+        message_text += (
+            f"\n<b>{cycle.job}</b> · {cycle.account} · "
+            f"{cycle.started:%H:%M:%S} · {cycle.duration:.1f} с\n"
+            f"оброблено {cycle.counts['processed']}, "
+            f"підходить {cycle.counts['matched']}, "
+            f"змінено {cycle.counts['mutated']}, "
+            f"помилок {cycle.counts['failed']}\n"
+        )
+        if phases:
+            message_text += f"<i>{phases}</i>\n"
+
+    requests = metrics.requests_summary()
+    if requests:
+        message_text += "\n<b>Запити</b>\n"
+        for operation, (total, failed) in sorted(requests.items()):
+            success = 100 * (total - failed) / total
+            message_text += f"{operation}: {total:g} (успішно {success:.0f}%)\n"
+
+    return message_text + format_skips() + scope
+
+
+@router.message(Command("stats"))
+async def stats(message: Message):
+    try:
+        await message.answer(format_stats(stats_cycles))
+    except Exception as e:
+        logger.error(f"Short error message: {e}")
+        logger.error(traceback.format_exc())
+        await message.answer("Виникла помилка 😞...")
+
+
 @router.callback_query(F.data == "panel")
 async def callback_panel(callback: CallbackQuery, state: FSMContext):
     try:
         await state.clear()
         await callback.message.edit_text(
-            "⚙️ Панель управління",
+            panel_text(),
             reply_markup=get_callback_btns(btns=panel_keyboard(), sizes=(1,)),
         )
     except Exception as e:
@@ -90,48 +243,46 @@ async def callback_panel(callback: CallbackQuery, state: FSMContext):
         await callback.answer("Виникла помилка 😞...")
 
 
-class AuthState(StatesGroup):
-    email = State()
-    code = State()
-
-
-@router.callback_query(F.data == "auth")
-async def auth(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(F.data.startswith("account_"))
+async def account_panel(callback: CallbackQuery, state: FSMContext):
     try:
-        if scheduler.get_job("reupload_products_job"):
-            await callback.answer(
-                "❌ Парсер вже запущено. Вимкніть його перед авторизацією."
-            )
+        await state.clear()
+        pk = int(callback.data.split("_")[-1])
+        account = pool.accounts.get(pk)
+        if not account:
+            await callback.answer("❌ Аккаунт не знайдено.")
             return
 
-        if os.path.exists(playerok.storage_cookies_path):
-            btns = {
-                "✅ Так": "auth_update",
-                "❌ Ні": "panel",
-            }
-            await callback.message.edit_text(
-                "❌ Ви вже авторизовані. Хочете оновити аккаунт?",
-                reply_markup=get_callback_btns(btns=btns, sizes=(1,)),
-            )
-        else:
-            await callback.message.edit_text(
-                "🔐 Введіть email для авторизації на Playerok:"
-            )
-            await state.set_state(AuthState.email)
+        await callback.message.edit_text(
+            f"👤 {account.name}\n\n"
+            f"Парсер: кожні {account.reupload_interval} хв.\n"
+            f"Автопідняття: кожні {account.autolift_interval} хв.\n"
+            f"{await budget_text(pk)}\n\n"
+            f"{playerok_state(pk)}",
+            reply_markup=get_callback_btns(btns=account_keyboard(pk), sizes=(1,)),
+        )
     except Exception as e:
         logger.error(f"Short error message: {e}")
         logger.error(traceback.format_exc())
-        await callback.message.answer("Виникла помилка 😞...")
+        await callback.answer("Виникла помилка 😞...")
 
 
-@router.callback_query(F.data == "auth_update")
-async def auth_update(callback: CallbackQuery, state: FSMContext):
-    try:
-        if os.path.exists(playerok.storage_cookies_path):
-            os.remove(playerok.storage_cookies_path)
+class AuthState(StatesGroup):
+    email = State()
+    code = State()
+
+
+# clients that are waiting for the email code, by telegram user id;
+# they hold a live session and can't be stored in the FSM data
+auth_clients = {}
 
+
+@router.callback_query(F.data == "auth")
+async def auth(callback: CallbackQuery, state: FSMContext):
+    try:
         await callback.message.edit_text(
-            "🔐 Введіть email для авторизації на Playerok:"
+            "🔐 Введіть email для авторизації на Playerok:\n"
+            "Якщо аккаунт вже додано, його сесію буде оновлено."
         )
         await state.set_state(AuthState.email)
     except Exception as e:
@@ -148,12 +299,14 @@ async def auth_email(message: Message, state: FSMContext):
             await message.answer("❌ Email не може бути порожнім.")
             return
 
-        result = playerok.get_email_auth_code(email)
+        client = pool.new_client()
+        result = await client.get_email_auth_code(email)
 
         if not result:
             await message.answer("❌ Помилка при авторизації. Спробуйте пізніше.")
             return
 
+        auth_clients[message.from_user.id] = client
         await message.answer("🔐 Введіть код з SMS для завершення авторизації:")
         await state.update_data(email=email)
         await state.set_state(AuthState.code)
@@ -174,14 +327,21 @@ async def auth_code(message: Message, state: FSMContext, session: AsyncSession):
             await message.answer("❌ Код не може бути порожнім.")
             return
 
-        print(f"Email: {email}, Code: {code}")  # Debugging line
-        result = playerok.verify_email_code(email, code)
+        client = auth_clients.get(message.from_user.id)
+        if not client:
+            await message.answer("❌ Сесію авторизації втрачено. Почніть знову.")
+            await panel(message, state, session)
+            return
+
+        result = await client.verify_email_code(email, code)
 
         if not result:
             await message.answer("❌ Помилка при авторизації. Перевірте код.")
             return
         else:
-            await message.answer("✅ Авторизація успішна!")
+            auth_clients.pop(message.from_user.id, None)
+            account = await pool.save_login(client, email)
+            await message.answer(f"✅ Авторизація успішна! Аккаунт: {account.name}")
             await panel(message, state, session)
     except Exception as e:
         logger.error(f"Short error message: {e}")
@@ -189,7 +349,71 @@ async def auth_code(message: Message, state: FSMContext, session: AsyncSession):
         await message.answer("Виникла помилка 😞...")
 
 
-@router.callback_query(F.data == "enable_parser")
+class BudgetState(StatesGroup):
+    amount = State()
+
+
+@router.callback_query(F.data.startswith("budget_"))
+async def budget(callback: CallbackQuery, state: FSMContext):
+    try:
+        pk = int(callback.data.split("_")[-1])
+        await callback.message.edit_text(
+            "💰 Введіть бюджет автопідняття\n"
+            'Приклад: "500 day" або "100 hour", "0" — без ліміту'
+        )
+        await state.update_data(account_pk=pk)
+        await state.set_state(BudgetState.amount)
+    except Exception as e:
+        logger.error(f"Short error message: {e}")
+        logger.error(traceback.format_exc())
+        await callback.message.answer("Виникла помилка 😞...")
+
+
+@router.message(BudgetState.amount)
+async def set_budget(message: Message, state: FSMContext, session: AsyncSession):
+    try:
+        data = await state.get_data()
+        pk = data.get("account_pk")
+        parts = message.text.split()
+        amount = int(parts[0])
+        period = parts[1].lower() if len(parts) > 1 else "day"
+
+        if amount < 0 or period not in PERIOD_NAMES:
+            await message.answer("❌ Неправильний формат бюджету.")
+            return
+
+        if amount:
+            await spend_budget.set(pk, amount, period)
+        else:
+            await spend_budget.clear(pk)
+        await message.answer(f"✅ {await budget_text(pk)}")
+
+        await state.clear()
+        await panel(message, state, session)
+    except Exception as e:
+        logger.error(f"Short error message: {e}")
+        logger.error(traceback.format_exc())
+        await message.answer("❌ Неправильний формат бюджету.")
+
+
+@router.callback_query(F.data.startswith("delete_account_"))
+async def delete_account(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
+    try:
+        pk = int(callback.data.split("_")[-1])
+        unschedule(pk)
+        await pool.remove(pk)
+        await callback.answer("✅ Аккаунт видалено")
+
+        await callback_panel(callback, state)
+    except Exception as e:
+        logger.error(f"Short error message: {e}")
+        logger.error(traceback.format_exc())
+        await callback.message.answer("Виникла помилка 😞...")
+
+
+@router.callback_query(F.data.startswith("enable_parser_"))
 async def enable_parser(
     callback: CallbackQuery,
     state: FSMContext,
@@ -197,37 +421,32 @@ async def enable_parser(
     bot: Bot,
 ):
     try:
-        if scheduler.get_job("reupload_products_job"):
+        pk = int(callback.data.split("_")[-1])
+        account = pool.accounts.get(pk)
+        if not account:
+            await callback.answer("❌ Аккаунт не знайдено.")
+            return
+
+        if scheduler.get_job(reupload_job_id(pk)):
             await callback.answer("❌ Парсер вже запущено.")
             return
         else:
             await callback.message.edit_text("🔐 Провіряю авторизацію...")
-            if not os.path.exists(playerok.storage_cookies_path):
+            if not pool.get(pk).credentials.is_authorized:
                 await callback.message.answer(
-                    "❌ Ви не авторизовані. Будь ласка, спочатку авторизуйтесь."
+                    "❌ Аккаунт не авторизований. Будь ласка, авторизуйтесь знову."
                 )
                 return
 
             await callback.message.answer("🚀 Парсер запущений")
 
-            keywords = await db.orm_read(session, db.Keyword, as_iterable=True)
-            if not keywords:
+            if not await parser_keyword_store.get():
                 await callback.message.answer(
                     "❌ Немає ключових слів для парсингу. Будь ласка, додайте їх."
                 )
                 return
 
-            keywords = [keyword.keyword for keyword in keywords]
-            admin_ids = admin_list.split(",")
-
-            scheduler.add_job(
-                reupload_products,
-                "interval",
-                minutes=3,
-                id="reupload_products_job",
-                args=[playerok, keywords, bot, admin_ids],
-                replace_existing=True,
-            )
+            schedule_reupload(account)
 
         await panel(callback.message, state, session)
     except Exception as e:
@@ -236,17 +455,18 @@ async def enable_parser(
         await callback.message.answer("Виникла помилка 😞...")
 
 
-@router.callback_query(F.data == "disable_parser")
+@router.callback_query(F.data.startswith("disable_parser_"))
 async def disable_parser(
     callback: CallbackQuery, state: FSMContext, session: AsyncSession
 ):
     try:
-        job = scheduler.get_job("reupload_products_job")
+        pk = int(callback.data.split("_")[-1])
+        job = scheduler.get_job(reupload_job_id(pk))
         if not job:
             await callback.answer("❌ Парсер вже вимкнено.")
             return
         else:
-            scheduler.remove_job("reupload_products_job")
+            scheduler.remove_job(reupload_job_id(pk))
             await callback.answer("Парсер вимкнено ❌")
 
         await panel(callback.message, state, session)
@@ -312,6 +532,7 @@ async def set_keywords(message: Message, state: FSMContext, session: AsyncSessio
 
         for keyword in keywords:
             result = await db.orm_create(session, db.Keyword, {"keyword": keyword})
+            parser_keyword_store.invalidate()
             if not result:
                 await message.answer(
                     f"❌ Помилка при додаванні ключового слова: {keyword}"
@@ -365,6 +586,7 @@ async def delete_keyword(
     try:
         pk = int(callback.data.split("_")[-1])
         result = await db.orm_delete(session, db.Keyword, pk)
+        parser_keyword_store.invalidate()
         if result:
             await callback.answer("✅ Ключове слово видалено")
         else:
@@ -458,6 +680,7 @@ async def set_autolift_keywords(
             result = await db.orm_create(
                 session, db.AutoliftKeyword, {"keyword": kw, "position": position}
             )
+            autolift_keyword_store.invalidate()
             if not result:
                 await message.answer(f"❌ Помилка при додаванні ключового слова: {kw}")
                 return
@@ -515,6 +738,7 @@ async def delete_autolift_keyword(
     try:
         pk = int(callback.data.split("_")[-1])
         result = await db.orm_delete(session, db.AutoliftKeyword, pk)
+        autolift_keyword_store.invalidate()
         if result:
             await callback.answer("✅ Ключове слово для автопідняття видалено")
         else:
@@ -542,7 +766,7 @@ async def delete_autolift_keyword(
         await callback.message.answer("Виникла помилка 😞...")
 
 
-@router.callback_query(F.data == "enable_autolift")
+@router.callback_query(F.data.startswith("enable_autolift_"))
 async def enable_autolift(
     callback: CallbackQuery,
     state: FSMContext,
@@ -550,43 +774,33 @@ async def enable_autolift(
     bot: Bot,
 ):
     try:
-        if scheduler.get_job("autolift_job"):
+        pk = int(callback.data.split("_")[-1])
+        account = pool.accounts.get(pk)
+        if not account:
+            await callback.answer("❌ Аккаунт не знайдено.")
+            return
+
+        if scheduler.get_job(autolift_job_id(pk)):
             await callback.answer("❌ Автопідняття вже запущено.")
             return
         else:
             await callback.message.edit_text("🔐 Провіряю авторизацію...")
 
-            if not os.path.exists(playerok.storage_cookies_path):
+            if not pool.get(pk).credentials.is_authorized:
                 await callback.message.answer(
-                    "❌ Ви не авторизовані. Будь ласка, спочатку авторизуйтесь."
+                    "❌ Аккаунт не авторизований. Будь ласка, авторизуйтесь знову."
                 )
                 return
 
             await callback.message.answer("🚀 Автопідняття запущено")
 
-            autolift_keywords = await db.orm_read(
-                session, db.AutoliftKeyword, as_iterable=True
-            )
-            if not autolift_keywords:
+            if not await autolift_keyword_store.get():
                 await callback.message.answer(
                     "❌ Немає ключових слів для автопідняття. Будь ласка, додайте їх."
                 )
                 return
 
-            autolift_keywords = [
-                {"keyword": kw.keyword, "position": kw.position}
-                for kw in autolift_keywords
-            ]
-            admin_ids = admin_list.split(",")
-
-            scheduler.add_job(
-                autolift_products,
-                "interval",
-                minutes=5,
-                id="autolift_job",
-                args=[playerok, autolift_keywords, bot, admin_ids],
-                replace_existing=True,
-            )
+            schedule_autolift(account)
 
         await panel(callback.message, state, session)
     except Exception as e:
@@ -595,17 +809,18 @@ async def enable_autolift(
         await callback.message.answer("Виникла помилка 😞...")
 
 
-@router.callback_query(F.data == "disable_autolift")
+@router.callback_query(F.data.startswith("disable_autolift_"))
 async def disable_autolift(
     callback: CallbackQuery, state: FSMContext, session: AsyncSession
 ):
     try:
-        job = scheduler.get_job("autolift_job")
+        pk = int(callback.data.split("_")[-1])
+        job = scheduler.get_job(autolift_job_id(pk))
         if not job:
             await callback.answer("❌ Автопідняття вже вимкнено.")
             return
         else:
-            scheduler.remove_job("autolift_job")
+            scheduler.remove_job(autolift_job_id(pk))
             await callback.answer("Автопідняття вимкнено ❌")
 
         await panel(callback.message, state, session)
@@ -0,0 +1,57 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from keywords import normalize
+
+
+@dataclass(slots=True)
+class Item:
+    """
+    One entry of the items listing, decoded once per response. The
+    timestamp is parsed and the name folded for keyword matching up
+    front, so the jobs never touch the raw nodes.
+    """
+
+    id: str
+    slug: str
+    name: str
+    name_folded: str
+    created_at: datetime
+    raw_price: int
+    attachment_url: str
+    status: str
+    position: int = None
+
+    @classmethod
+    def from_node(cls, node: dict) -> "Item":
+        position = node.get("sequence")
+        if position is None:
+            position = node.get("priorityPosition")
+
+        return cls(
+            id=node["id"],
+            slug=node["slug"],
+            name=node["name"],
+            name_folded=normalize(node["name"]),
+            created_at=datetime.fromisoformat(node["createdAt"].replace("Z", "+00:00")),
+            raw_price=node.get("rawPrice"),
+            attachment_url=(node.get("attachment") or {}).get("url"),
+            status=node.get("status"),
+            position=position,
+        )
+
+
+@dataclass(slots=True)
+class ItemsPage:
+    items: list = field(default_factory=list)
+    end_cursor: str = None
+    has_next_page: bool = False
+
+    @classmethod
+    def from_response(cls, data: dict) -> "ItemsPage":
+        page_info = data.get("pageInfo") or {}
+        return cls(
+            items=[Item.from_node(edge["node"]) for edge in data.get("edges") or []],
+            end_cursor=page_info.get("endCursor"),
+            has_next_page=bool(page_info.get("hasNextPage")),
+        )
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+
+from collections import Counter
+from aiogram import Bot
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from accounts import pool
+from notifier import notifier
+from keywords import parser_keyword_store, autolift_keyword_store
+from utils import reupload_products, autolift_products
+from workqueue import work_queue
+from config import admin_list, distributed_jobs
+from cron import scheduler
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Jobs are stored in the database, so they are scheduled by reference and
+# take only the account id as argument. Each account has its own client in
+# accounts.pool; the parser and autolift jobs of one account share it, its
+# session state is guarded by Playerok.session_lock.
+# With DISTRIBUTED_JOBS the jobs only enqueue a work unit, and the unit
+# is run by one of the worker.py processes.
+
+
+class JobRunner:
+    """
+    Runs at most one instance of each job. Ticks that arrive while a run
+    is still active are skipped and counted, so the intervals can be sized
+    from the skip rate. Runs the scheduler missed (the process was down or
+    the loop blocked past the grace time) are counted apart from them.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self.runs = Counter()
+        self.skipped = Counter()
+        self.missed = Counter()
+
+    async def run(self, job_id: str, func, *args):
+        lock = self._locks.setdefault(job_id, asyncio.Lock())
+        if lock.locked():
+            self.skip(job_id)
+            return
+
+        async with lock:
+            self.runs[job_id] += 1
+            await func(*args)
+
+    def skip(self, job_id: str):
+        self.skipped[job_id] += 1
+        metrics.inc("cycles_skipped_total", job=job_kind(job_id), reason="overlap")
+        logger.warning(
+            f"Job {job_id} is still running, tick skipped "
+            f"({self.skipped[job_id]} skipped / {self.runs[job_id]} runs)"
+        )
+
+    def miss(self, job_id: str):
+        self.missed[job_id] += 1
+        metrics.inc("cycles_skipped_total", job=job_kind(job_id), reason="missed")
+        logger.warning(
+            f"Job {job_id} missed its run time "
+            f"({self.missed[job_id]} missed / {self.runs[job_id]} runs)"
+        )
+
+    def on_scheduler_skip(self, event):
+        # coalesced or over-limit ticks never reach run()
+        if event.code == EVENT_JOB_MISSED:
+            self.miss(event.job_id)
+        else:
+            self.skip(event.job_id)
+
+
+runner = JobRunner()
+scheduler.add_listener(
+    runner.on_scheduler_skip, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+)
+
+
+async def setup(bot: Bot):
+    notifier.start(bot)
+    await pool.load()
+    migrate_legacy_jobs()
+
+
+def admin_ids() -> list:
+    return admin_list.replace(" ", "").split(",") if admin_list else []
+
+
+def job_kind(job_id: str) -> str:
+    return "reupload" if job_id.startswith("reupload") else "autolift"
+
+
+def reupload_job_id(account_pk: int) -> str:
+    return f"reupload_products_job_{account_pk}"
+
+
+def autolift_job_id(account_pk: int) -> str:
+    return f"autolift_job_{account_pk}"
+
+
+def schedule_reupload(account):
+    scheduler.add_job(
+        reupload_job,
+        "interval",
+        minutes=account.reupload_interval,
+        jitter=30,
+        id=reupload_job_id(account.pk),
+        args=[account.pk],
+        replace_existing=True,
+    )
+
+
+def schedule_autolift(account):
+    scheduler.add_job(
+        autolift_job,
+        "interval",
+        minutes=account.autolift_interval,
+        jitter=30,
+        id=autolift_job_id(account.pk),
+        args=[account.pk],
+        replace_existing=True,
+    )
+
+
+def unschedule(account_pk: int):
+    for job_id in (reupload_job_id(account_pk), autolift_job_id(account_pk)):
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+
+
+def migrate_legacy_jobs():
+    # single-account installs stored the jobs without an account id
+    legacy_jobs = {
+        "reupload_products_job": schedule_reupload,
+        "autolift_job": schedule_autolift,
+    }
+    for job_id, schedule in legacy_jobs.items():
+        if not scheduler.get_job(job_id):
+            continue
+
+        scheduler.remove_job(job_id)
+        if len(pool.accounts) == 1:
+            account = next(iter(pool.accounts.values()))
+            schedule(account)
+            logger.info(f"Moved job {job_id} to account {account.name}")
+
+
+async def reupload_job(account_pk: int):
+    if distributed_jobs:
+        await work_queue.enqueue(account_pk, "reupload")
+        return
+
+    playerok = pool.get(account_pk)
+    if not playerok:
+        logger.warning(f"Account {account_pk} not found, skipping reupload")
+        return
+
+    await runner.run(
+        reupload_job_id(account_pk),
+        reupload_products,
+        playerok,
+        parser_keyword_store,
+        notifier,
+        admin_ids(),
+    )
+
+
+async def autolift_job(account_pk: int):
+    if distributed_jobs:
+        await work_queue.enqueue(account_pk, "autolift")
+        return
+
+    playerok = pool.get(account_pk)
+    if not playerok:
+        logger.warning(f"Account {account_pk} not found, skipping autolift")
+        return
+
+    await runner.run(
+        autolift_job_id(account_pk),
+        autolift_products,
+        playerok,
+        autolift_keyword_store,
+        notifier,
+        admin_ids(),
+    )
@@ -0,0 +1,155 @@
+import logging
+
+import database as db
+
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_
+from database import session_maker
+from budget import spend_budget
+from items import Item
+from playerok import Playerok, ITEM_STATUSES
+from config import request_timeout, mutation_rate_per_minute
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = ("pending", "unknown")
+
+# a paid call waits at most one mutation interval for its token and then
+# the request timeout for the answer
+IN_FLIGHT = timedelta(seconds=request_timeout + 60 / mutation_rate_per_minute)
+
+
+class MutationJournal:
+    """
+    Write-ahead journal of the paid mutations. An intent row is written
+    before publishItem / increaseItemPriorityStatus is sent and its state
+    is set from the response:
+
+    pending      the call was sent and the process died before the answer
+    unknown      the call timed out or failed, it may still have gone through
+    applied      the mutation is known to have been applied
+    not_applied  reconciliation found that the item was not changed
+
+    At the start of every cycle the account's unresolved entries are
+    resolved by re-reading the item with get_product, whether or not the
+    item is still a candidate, and so is an entry met again before its
+    item is paid for. A pending entry younger than the request timeout
+    (plus the wait for a mutation token) may still be in flight in another
+    process and is left alone. An autolift resolved as applied is charged
+    to the account budget at the cost quoted when it was sent.
+    """
+
+    def __init__(self):
+        self._unresolved = {}
+
+    async def refresh(self, playerok: Playerok):
+        # entries can be written by other worker processes, so the set is
+        # re-read once per cycle; it only holds the unresolved rows
+        async with session_maker() as session:
+            rows = (
+                await session.scalars(
+                    select(db.Mutation).where(db.Mutation.state.in_(UNRESOLVED))
+                )
+            ).all()
+        self._unresolved = {(row.item_id, row.action): row for row in rows}
+
+        # an item the mutation did move is no longer a candidate, so its
+        # entry would never be met again
+        account_pk = getattr(playerok.credentials, "account_pk", None)
+        settled_before = datetime.utcnow() - IN_FLIGHT
+        for row in rows:
+            if row.account_pk in (account_pk, None) and row.created <= settled_before:
+                await self.reconcile(playerok, row)
+
+    def unresolved(self, item_id: str, action: str):
+        return self._unresolved.get((item_id, action))
+
+    async def begin(
+        self,
+        item: Item,
+        action: str,
+        priority_status_id: str,
+        account_pk: int = None,
+        cost: int = None,
+    ):
+        entry = db.Mutation(
+            item_id=item.id,
+            slug=item.slug,
+            action=action,
+            priority_status_id=priority_status_id,
+            state="pending",
+            status_before=item.status,
+            position_before=item.position,
+            account_pk=account_pk,
+            cost=cost,
+            created=datetime.utcnow(),
+        )
+        async with session_maker() as session:
+            session.add(entry)
+            await session.commit()
+        self._unresolved[(item.id, action)] = entry
+        return entry
+
+    async def finish(self, entry, state: str) -> bool:
+        """
+        Set the entry state. Returns False when another job or process
+        has resolved the entry in the meantime.
+        """
+        entry.state = state
+        async with session_maker() as session:
+            result = await session.execute(
+                update(db.Mutation)
+                .where(
+                    db.Mutation.pk == entry.pk,
+                    db.Mutation.state.in_(UNRESOLVED),
+                )
+                .values(state=state, finished=datetime.utcnow())
+            )
+            await session.commit()
+
+        if state in UNRESOLVED:
+            self._unresolved[(entry.item_id, entry.action)] = entry
+        else:
+            self._unresolved.pop((entry.item_id, entry.action), None)
+        return result.rowcount > 0
+
+    async def reconcile(self, playerok: Playerok, entry) -> str:
+        """
+        Resolve an entry from the current item state. Returns the new
+        state, "pending" while the call may still be in flight, or
+        "unknown" when the item could not be read.
+        """
+        if entry.state == "pending" and entry.created > datetime.utcnow() - IN_FLIGHT:
+            return "pending"
+
+        product = await playerok.get_product(entry.slug)
+        if not product:
+            logger.warning(
+                f"Can't reconcile {entry.action} of item {entry.item_id}, item not readable"
+            )
+            return "unknown"
+
+        if entry.action == "reupload":
+            # a published item leaves the finished statuses
+            applied = product.get("status") in ITEM_STATUSES["active"]
+        elif entry.position_before is None:
+            # nothing to compare with, assume the lift went through rather
+            # than paying twice
+            applied = True
+        else:
+            sequence = product.get("sequence")
+            applied = sequence is not None and sequence < entry.position_before
+
+        state = "applied" if applied else "not_applied"
+        if not await self.finish(entry, state):
+            # resolved concurrently, and charged there if it was applied
+            return state
+        if applied and entry.action == "autolift" and entry.cost:
+            await spend_budget.record(
+                entry.account_pk, entry.item_id, entry.action, entry.cost
+            )
+        logger.info(f"Reconciled {entry.action} of item {entry.item_id}: {state}")
+        return state
+
+
+mutation_journal = MutationJournal()
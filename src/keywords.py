@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import unicodedata
+
+import database as db
+
+from collections import deque
+from database import session_maker
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    """
+    Casefold text and fold Cyrillic variants so that "Ёжик" and "ежик"
+    match the same keyword.
+    """
+    return unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+
+
+class KeywordIndex:
+    """
+    Aho-Corasick automaton over the keyword list. Built once from the
+    Keyword / AutoliftKeyword rows, it finds every keyword contained in a
+    product name in a single pass over the name.
+    """
+
+    def __init__(self, keywords=()):
+        # keywords is an iterable of (keyword, position) pairs, position
+        # is None for parser keywords
+        self.keywords = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for keyword, position in keywords:
+            keyword = normalize(keyword.strip())
+            if keyword:
+                self._add(keyword, len(self.keywords))
+                self.keywords.append((keyword, position))
+
+        self._build()
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls((row.keyword, getattr(row, "position", None)) for row in rows)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _add(self, keyword, index):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(index)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def search(self, text: str, normalized: bool = False) -> list:
+        """
+        Return (keyword, position) pairs for every keyword found in text.
+        Pass normalized=True when text already went through normalize().
+        """
+        found = set()
+        state = 0
+        for char in text if normalized else normalize(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._out[state])
+
+        return [self.keywords[index] for index in sorted(found)]
+
+    def match(self, text: str, normalized: bool = False) -> bool:
+        return bool(self.search(text, normalized))
+
+    def strictest_position(self, text: str, normalized: bool = False):
+        """
+        Return the smallest target position among matching keywords, or
+        None when nothing matches.
+        """
+        positions = [
+            position
+            for _, position in self.search(text, normalized)
+            if position is not None
+        ]
+        return min(positions) if positions else None
+
+
+class StaticKeywordStore:
+    """
+    Fixed keyword set with the KeywordStore interface, for scripts and
+    benchmarks that run without the database.
+    """
+
+    def __init__(self, keywords):
+        self._index = KeywordIndex(keywords)
+
+    async def get(self) -> KeywordIndex:
+        return self._index
+
+
+class KeywordStore:
+    """
+    Versioned keyword cache shared by the handlers and the scheduler jobs.
+    Handlers call invalidate() after every write, jobs call get() on each
+    cycle and the table is only re-read when the version has changed.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version = 0
+        self._loaded_version = None
+        self._index = KeywordIndex()
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+
+    async def get(self) -> KeywordIndex:
+        if self._loaded_version == self.version:
+            return self._index
+
+        async with self._lock:
+            version = self.version
+            if self._loaded_version != version:
+                async with session_maker() as session:
+                    rows = await db.orm_read(session, self.model, as_iterable=True)
+
+                if rows is False:
+                    logger.warning(f"Failed to reload {self.model.__tablename__}")
+                    return self._index
+
+                self._index = KeywordIndex.from_rows(rows)
+                self._loaded_version = version
+                logger.info(
+                    f"Loaded {len(self._index)} keywords from "
+                    f"{self.model.__tablename__} (version {version})"
+                )
+
+        return self._index
+
+
+parser_keyword_store = KeywordStore(db.Keyword)
+autolift_keyword_store = KeywordStore(db.AutoliftKeyword)
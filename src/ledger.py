@@ -0,0 +1,90 @@
+import asyncio
+import logging
+
+import database as db
+
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from database import session_maker
+from config import processed_item_cooldown_hours
+
+logger = logging.getLogger(__name__)
+
+
+class Ledger:
+    """
+    Records which items the jobs have already handled. The latest entry
+    per (item_id, action) is kept in memory, backed by the processed_item
+    table so the history survives restarts.
+    """
+
+    def __init__(self, cooldown_hours: float):
+        self.cooldown = timedelta(hours=cooldown_hours)
+        self._entries = {}
+        self._loaded = False
+        self._synced_at = None
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        if not self._loaded:
+            await self.sync()
+
+    async def sync(self):
+        """
+        Merge the entries recorded since the last sync. Worker processes
+        call it before each unit to see what the other workers have done.
+        """
+        async with self._lock:
+            now = datetime.utcnow()
+            if self._synced_at:
+                # overlap a little with rows committed after the last read
+                since = self._synced_at - timedelta(minutes=1)
+            else:
+                since = now - self.cooldown
+
+            async with session_maker() as session:
+                result = await session.execute(
+                    select(
+                        db.ProcessedItem.item_id,
+                        db.ProcessedItem.action,
+                        db.ProcessedItem.at,
+                    ).where(db.ProcessedItem.at >= since)
+                )
+                for item_id, action, at in result:
+                    key = (item_id, action)
+                    if key not in self._entries or self._entries[key] < at:
+                        self._entries[key] = at
+
+            self._synced_at = now
+            if not self._loaded:
+                self._loaded = True
+                logger.info(
+                    f"Loaded {len(self._entries)} processed items from the ledger"
+                )
+
+    async def is_recent(self, item_id: str, action: str) -> bool:
+        if not self._loaded:
+            await self.load()
+
+        at = self._entries.get((item_id, action))
+        return at is not None and datetime.utcnow() - at < self.cooldown
+
+    async def record(self, item_id: str, action: str, result: str, price=None):
+        at = datetime.utcnow()
+        self._entries[(item_id, action)] = at
+
+        async with session_maker() as session:
+            await db.orm_create(
+                session,
+                db.ProcessedItem,
+                {
+                    "item_id": item_id,
+                    "action": action,
+                    "result": result,
+                    "at": at,
+                    "price": price,
+                },
+            )
+
+
+ledger = Ledger(processed_item_cooldown_hours)
@@ -0,0 +1,118 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import re
+
+from datetime import datetime, timezone
+from config import (
+    log_level,
+    log_levels,
+    log_max_bytes,
+    log_backup_count,
+    log_max_message,
+)
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# cookie headers, bearer tokens and token-like fields in dicts, JSON and
+# query strings
+SECRETS = [
+    re.compile(r"(?i)(['\"]?(?:cookie|set-cookie|authorization)['\"]?\s*[:=]\s*)(['\"]).*?\2"),
+    re.compile(r"(?i)(['\"]?(?:cookie|set-cookie|authorization)['\"]?\s*[:=]\s*)[^,}\n]+"),
+    re.compile(r"(?i)(['\"]?(?:token|access_token|refresh_token|password)['\"]?\s*[:=]\s*)(['\"])[^'\"]*\2"),
+    re.compile(r"(?i)(bearer\s+)[\w.\-]+"),
+]
+
+
+def redact(text: str) -> str:
+    for pattern in SECRETS:
+        text = pattern.sub(lambda match: f"{match.group(1)}<redacted>", text)
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """
+    Merge the message arguments, strip secrets and cut long messages
+    (response bodies, headers) before the record leaves the caller.
+    """
+
+    def __init__(self, max_length: int):
+        super().__init__()
+        self.max_length = max_length
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = redact(record.getMessage())
+        if len(message) > self.max_length:
+            message = (
+                f"{message[: self.max_length]}... "
+                f"[{len(message) - self.max_length} chars truncated]"
+            )
+        record.msg = message
+        record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RedactingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the message is already merged by RedactingFilter; render the
+        # traceback here, exc_info can't cross to the listener thread
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = redact(
+                logging.Formatter().formatException(record.exc_info)
+            )
+            record.exc_info = None
+        return record
+
+
+def setup_logging(filename: str) -> logging.handlers.QueueListener:
+    """
+    Send all records through a queue to a listener thread, which writes
+    JSON lines to a size-rotated file and plain lines to the console.
+    The event loop only formats the message and puts it on the queue.
+    Stop the returned listener on shutdown to flush the queue.
+    """
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename,
+        maxBytes=log_max_bytes,
+        backupCount=log_backup_count,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(FORMAT))
+
+    records = queue.SimpleQueue()
+    queue_handler = RedactingQueueHandler(records)
+    queue_handler.addFilter(RedactingFilter(log_max_message))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(log_level)
+
+    # per-module levels, e.g. LOG_LEVELS="playerok=WARNING,aiogram=INFO"
+    for item in log_levels.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    listener = logging.handlers.QueueListener(
+        records, file_handler, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    return listener
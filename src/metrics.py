@@ -0,0 +1,239 @@
+import bisect
+import contextvars
+import functools
+import logging
+import time
+
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from aiohttp import web
+from config import metrics_host, metrics_port
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_cycle = contextvars.ContextVar("current_cycle", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Cycle:
+    """
+    One run of a job: total duration, time per phase (fetch, match,
+    quote, mutate, notify, throttle) and item outcome counts.
+    """
+
+    __slots__ = ("job", "account", "started", "duration", "phases", "counts")
+
+    def __init__(self, job: str, account: str):
+        self.job = job
+        self.account = account
+        self.started = datetime.now()
+        self.duration = None
+        self.phases = Counter()
+        self.counts = Counter()
+
+
+class Span:
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+class Metrics:
+    """
+    In-memory counters and latency histograms, the last job cycles and a
+    Prometheus text exporter. Spans opened while a cycle is running add
+    their time to the cycle phase they belong to.
+    """
+
+    def __init__(self, history: int = 50):
+        self.counters = Counter()
+        self.histograms = {}
+        self.cycles = deque(maxlen=history)
+        self._runner = None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] += value
+        cycle = _current_cycle.get()
+        if cycle is not None and "outcome" in labels:
+            cycle.counts[labels["outcome"]] += value
+
+    def observe(self, name: str, value: float, phase: str = None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+        cycle = _current_cycle.get()
+        if cycle is not None and phase:
+            cycle.phases[phase] += value
+
+    @contextmanager
+    def span(self, name: str, phase: str = None, **labels):
+        span = Span()
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.fail()
+            raise
+        finally:
+            self.observe(
+                f"{name}_seconds", time.perf_counter() - started, phase, **labels
+            )
+            self.inc(
+                f"{name}_total", status="error" if span.failed else "ok", **labels
+            )
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            cycle = _current_cycle.get()
+            if cycle is not None:
+                cycle.phases[name] += time.perf_counter() - started
+
+    def traced(self, job: str):
+        """
+        Decorator for the job functions: every call is recorded as a
+        Cycle of the account whose client is the first argument.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(playerok, *args, **kwargs):
+                cycle = Cycle(job, playerok.credentials.username)
+                token = _current_cycle.set(cycle)
+                started = time.perf_counter()
+                try:
+                    return await func(playerok, *args, **kwargs)
+                finally:
+                    _current_cycle.reset(token)
+                    cycle.duration = time.perf_counter() - started
+                    self.cycles.append(cycle)
+                    self.observe("cycle_seconds", cycle.duration, job=job)
+                    self.inc("cycles_total", job=job)
+
+            return wrapper
+
+        return decorator
+
+    def requests_summary(self) -> dict:
+        """
+        Return {operation: (total, failed)} for the Playerok requests.
+        """
+        summary = {}
+        for (name, labels), value in self.counters.items():
+            if name != "request_total":
+                continue
+            labels = dict(labels)
+            total, failed = summary.get(labels["operation"], (0, 0))
+            summary[labels["operation"]] = (
+                total + value,
+                failed + (value if labels["status"] == "error" else 0),
+            )
+        return summary
+
+    def skips_summary(self) -> dict:
+        """
+        Return {(job, reason): count} of the skipped job ticks.
+        """
+        summary = Counter()
+        for (name, labels), value in self.counters.items():
+            if name == "cycles_skipped_total":
+                labels = dict(labels)
+                summary[(labels["job"], labels["reason"])] += value
+        return summary
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE playerok_{name} counter")
+            for (metric, labels), value in sorted(self.counters.items()):
+                if metric == name:
+                    lines.append(f"playerok_{name}{_labels(labels)} {value:g}")
+
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f"# TYPE playerok_{name} histogram")
+            for (metric, labels), histogram in sorted(self.histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"playerok_{name}_bucket"
+                        f"{_labels(labels + (('le', str(bound)),))} {cumulative}"
+                    )
+                lines.append(f"playerok_{name}_sum{_labels(labels)} {histogram.sum:g}")
+                lines.append(f"playerok_{name}_count{_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, request: web.Request):
+        return web.Response(text=self.render(), content_type="text/plain")
+
+    async def start_exporter(
+        self, host: str = metrics_host, port: int = metrics_port, attempts: int = 1
+    ):
+        """
+        Serve /metrics on the first free port of port .. port + attempts - 1,
+        so that several processes on one host can each export their own.
+        """
+        if not port:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        for candidate in range(port, port + attempts):
+            try:
+                await web.TCPSite(self._runner, host, candidate).start()
+            except OSError as e:
+                error = e
+                continue
+            logger.info(
+                f"Metrics exporter listening on http://{host}:{candidate}/metrics"
+            )
+            return
+
+        logger.warning(f"Metrics exporter not started on {host}:{port}: {error}")
+        await self._runner.cleanup()
+        self._runner = None
+
+    async def stop_exporter(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+metrics = Metrics()
@@ -0,0 +1,241 @@
+import html
+import time
+import asyncio
+import logging
+
+from collections import OrderedDict
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputMediaPhoto
+from keyboards import get_url_btns
+from ratelimit import TokenBucket
+from items import Item
+from config import (
+    site_url,
+    notify_rate_per_second,
+    notify_chat_interval,
+    notify_digest_threshold,
+    notify_digest_window,
+)
+
+logger = logging.getLogger(__name__)
+
+MEDIA_GROUP_SIZE = 10
+
+
+class Notifier:
+    """
+    Background sender for admin notifications. Jobs enqueue and move on.
+    The worker reuses the Telegram file_id of every uploaded photo, keeps
+    within the global and per-chat rate limits and turns bursts into
+    media group digests. Notifications are held until the job calls
+    flush() at the end of its cycle, so a whole cycle can become one
+    digest however far apart the paid calls are; the digest window is
+    only the longest wait for the next notification when no flush comes.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = notify_rate_per_second,
+        chat_interval: float = notify_chat_interval,
+        digest_threshold: int = notify_digest_threshold,
+        digest_window: float = notify_digest_window,
+        file_id_cache_size: int = 1000,
+    ):
+        self.bucket = TokenBucket(rate_per_second, max(1, int(rate_per_second)))
+        self.chat_interval = chat_interval
+        self.digest_threshold = digest_threshold
+        self.digest_window = digest_window
+        self.file_id_cache_size = file_id_cache_size
+
+        self.bot: Bot = None
+        self.queue = asyncio.Queue()
+        self.file_ids = OrderedDict()
+        self._chat_sent_at = {}
+        self._task = None
+
+    def start(self, bot: Bot):
+        self.bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker())
+
+    async def stop(self, timeout: float = 10):
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.queue.qsize()} notifications dropped on shutdown")
+        self._task.cancel()
+        self._task = None
+
+    def notify(self, admin_ids: list, product: Item, button_text: str):
+        if not admin_ids:
+            return
+        self.queue.put_nowait(
+            {
+                "admin_ids": list(admin_ids),
+                "photo": product.attachment_url,
+                "name": product.name,
+                "id": product.id,
+                "url": f"{site_url}/products/{product.slug}",
+                "button_text": button_text,
+            }
+        )
+
+    def notify_text(self, admin_ids: list, text: str):
+        if not admin_ids:
+            return
+        self.queue.put_nowait({"admin_ids": list(admin_ids), "text": text})
+
+    def flush(self):
+        # end of a job cycle, send what it produced
+        self.queue.put_nowait({"flush": True})
+
+    async def _worker(self):
+        while True:
+            batch = [await self.queue.get()]
+            # collect the rest of the cycle, then decide between single
+            # messages and a digest
+            while "flush" not in batch[-1]:
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self.queue.get(), self.digest_window)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                batch_items = [n for n in batch if "flush" not in n]
+                texts = [n for n in batch_items if "text" in n]
+                photos = [n for n in batch_items if "text" not in n]
+                for notification in texts:
+                    await self._send_text(notification)
+                if len(photos) >= self.digest_threshold:
+                    await self._send_digest(photos)
+                else:
+                    for notification in photos:
+                        await self._send_single(notification)
+            except Exception as e:
+                logger.error(f"Notification worker error: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _wait_for_chat(self, chat_id, messages: int = 1):
+        await self.bucket.acquire()
+        sent_at = self._chat_sent_at.get(chat_id)
+        if sent_at is not None:
+            delay = sent_at + self.chat_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self._chat_sent_at[chat_id] = time.monotonic() + self.chat_interval * (
+            messages - 1
+        )
+
+    def _photo(self, url: str):
+        file_id = self.file_ids.get(url)
+        if file_id:
+            self.file_ids.move_to_end(url)
+            return file_id
+        return url
+
+    def _remember(self, url: str, message):
+        if message and message.photo and url not in self.file_ids:
+            self.file_ids[url] = message.photo[-1].file_id
+            if len(self.file_ids) > self.file_id_cache_size:
+                self.file_ids.popitem(last=False)
+
+    async def _call(self, method, messages: int = 1, **kwargs):
+        # up to three attempts while Telegram asks to retry later
+        for _ in range(3):
+            await self._wait_for_chat(kwargs["chat_id"], messages)
+            try:
+                return await method(**kwargs)
+            except TelegramRetryAfter as e:
+                logger.warning(f"Telegram flood control, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+        return None
+
+    async def _send_text(self, notification: dict):
+        for admin_id in notification["admin_ids"]:
+            try:
+                await self._call(
+                    self.bot.send_message,
+                    chat_id=admin_id,
+                    text=notification["text"],
+                    disable_web_page_preview=True,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to send message to admin {admin_id}: {e}")
+
+    async def _send_single(self, notification: dict):
+        for admin_id in notification["admin_ids"]:
+            try:
+                message = await self._call(
+                    self.bot.send_photo,
+                    chat_id=admin_id,
+                    photo=self._photo(notification["photo"]),
+                    reply_markup=get_url_btns(
+                        btns={notification["button_text"]: notification["url"]},
+                        sizes=(1,),
+                    ),
+                )
+                self._remember(notification["photo"], message)
+                logger.info(
+                    "Notification sent to admin %s for product '%s' (ID: %s).",
+                    admin_id,
+                    notification["name"],
+                    notification["id"],
+                )
+            except Exception as e:
+                logger.warning(
+                    "Failed to notify admin %s for product '%s' (ID: %s): %s",
+                    admin_id,
+                    notification["name"],
+                    notification["id"],
+                    e,
+                )
+
+    async def _send_digest(self, batch: list):
+        admin_ids = []
+        for notification in batch:
+            for admin_id in notification["admin_ids"]:
+                if admin_id not in admin_ids:
+                    admin_ids.append(admin_id)
+
+        for start in range(0, len(batch), MEDIA_GROUP_SIZE):
+            group = batch[start : start + MEDIA_GROUP_SIZE]
+            for admin_id in admin_ids:
+                notifications = [n for n in group if admin_id in n["admin_ids"]]
+                if not notifications:
+                    continue
+                if len(notifications) == 1:
+                    # a media group needs at least two photos
+                    await self._send_single({**notifications[0], "admin_ids": [admin_id]})
+                    continue
+
+                media = [
+                    InputMediaPhoto(
+                        media=self._photo(n["photo"]),
+                        caption=f'{n["button_text"]}: <a href="{n["url"]}">{html.escape(n["name"])}</a>',
+                    )
+                    for n in notifications
+                ]
+                try:
+                    messages = await self._call(
+                        self.bot.send_media_group,
+                        chat_id=admin_id,
+                        media=media,
+                        messages=len(media),
+                    )
+                    for n, message in zip(notifications, messages or []):
+                        self._remember(n["photo"], message)
+                    logger.info(
+                        f"Digest of {len(media)} notifications sent to admin {admin_id}."
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to send digest to admin {admin_id}: {e}")
+
+
+notifier = Notifier()
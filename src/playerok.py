@@ -1,8 +1,42 @@
-import os
+import time
 import random
+import hashlib
+import asyncio
+import functools
+import threading
 import cloudscraper
 import logging
 
+try:
+    import orjson as json_lib
+except ImportError:  # orjson is optional, the stdlib parser is the fallback
+    import json as json_lib
+
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    graphql_url,
+    request_timeout,
+    max_concurrent_requests,
+    read_rate_per_minute,
+    read_burst,
+    mutation_rate_per_minute,
+    mutation_burst,
+    listing_cache_ttl,
+    quote_cache_ttl,
+    quote_cache_size,
+    priority_batch_size,
+    breaker_failure_threshold,
+    endpoint_breaker_threshold,
+    breaker_base_delay,
+    breaker_max_delay,
+)
+from ratelimit import TokenBucket
+from items import ItemsPage
+from metrics import metrics
+from breaker import CircuitBreaker
+from credentials import Credentials
+from cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 USER_AGENTS = [
@@ -18,10 +52,59 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.6722.1 Safari/537.36",
 ]
 
+ITEM_STATUSES = {
+    "done": ["DECLINED", "BLOCKED", "EXPIRED", "SOLD", "DRAFT"],
+    "active": ["APPROVED", "PENDING_MODERATION", "PENDING_APPROVAL"],
+}
+
+# job cycle phase that the time spent in each client operation counts to
+OPERATION_PHASES = {
+    "get_products": "fetch",
+    "get_product": "fetch",
+    "get_priority_status": "quote",
+    "get_priority_statuses_batch": "quote",
+    "make_transaction": "mutate",
+    "make_autolift": "mutate",
+}
+
+# Mutations only need to confirm the new state of the item, so they select
+# a handful of fields instead of the whole RegularItem fragment tree
+PUBLISH_ITEM_QUERY = "mutation publishItem($input: PublishItemInput!) { publishItem(input: $input) { id status priorityPosition __typename } }"
+INCREASE_ITEM_PRIORITY_STATUS_QUERY = "mutation increaseItemPriorityStatus($input: PublishItemInput!) { increaseItemPriorityStatus(input: $input) { id status priorityPosition __typename } }"
+
+
+def decode(response):
+    return json_lib.loads(response.content)
+
+
+def is_persisted_query_not_found(response):
+    try:
+        data = decode(response)
+    except ValueError:
+        return False
+
+    for error in data.get("errors") or []:
+        code = (error.get("extensions") or {}).get("code")
+        if (
+            error.get("message") == "PersistedQueryNotFound"
+            or code == "PERSISTED_QUERY_NOT_FOUND"
+        ):
+            return True
+    return False
+
+
+def mutation_outcome(response):
+    # a 4xx is refused before the mutation runs; behind a 5xx (a gateway
+    # timeout, a crash after the write) it may still have been applied
+    return False if response.status_code < 500 else None
+
+
 
 class Playerok:
-    def __init__(self):
+    def __init__(self, url=graphql_url, credentials=None, executor=None):
         self.scraper = cloudscraper.create_scraper()
+        # guards scraper/headers, which are swapped from worker threads
+        self.session_lock = threading.RLock()
         self.headers = {
             "Content-Type": "application/json",
             "Origin": "https://playerok.com",
@@ -32,8 +115,38 @@ class Playerok:
             "Sec-Ch-Ua-Platform": '"Windows"',
             "Sec-Ch-Ua-Mobile": "?0",
         }
-        self.url = "https://playerok.com/graphql"
-        self.storage_cookies_path = "src/storage/cookies.txt"
+        self.url = url
+        self.credentials = credentials or Credentials()
+        self.listing_cache = TTLCache(listing_cache_ttl)
+        self.quote_cache = TTLCache(quote_cache_ttl, maxsize=quote_cache_size)
+        # item_id -> price of its latest quote, finds the quote a price
+        # change makes stale without scanning the cache
+        self.quoted_prices = {}
+        # None until the first batched request tells whether the endpoint
+        # accepts array payloads
+        self.batching_supported = None
+        self.timeout = request_timeout
+        # cloudscraper is synchronous, so every request runs in a bounded
+        # thread pool and the event loop only awaits the result
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_concurrent_requests, thread_name_prefix="playerok"
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        # per-operation breakers plus one for the whole endpoint
+        self.breakers = {}
+        self.endpoint_breaker = CircuitBreaker(
+            "endpoint",
+            endpoint_breaker_threshold,
+            breaker_base_delay,
+            breaker_max_delay,
+        )
+        self._local = threading.local()
+        # separate request budgets for listing/quote queries and for paid
+        # mutations, shared by every job that uses this client
+        self.read_bucket = TokenBucket(read_rate_per_minute / 60, read_burst)
+        self.mutation_bucket = TokenBucket(
+            mutation_rate_per_minute / 60, mutation_burst
+        )
 
     def get_random_user_agent(self, previous=None):
         if previous is None:
@@ -43,7 +156,367 @@ class Playerok:
             return previous
         return random.choice(candidates)
 
-    def get_email_auth_code(self, email):
+    def breaker(self, operation: str) -> CircuitBreaker:
+        breaker = self.breakers.get(operation)
+        if breaker is None:
+            breaker = self.breakers[operation] = CircuitBreaker(
+                operation,
+                breaker_failure_threshold,
+                breaker_base_delay,
+                breaker_max_delay,
+            )
+        return breaker
+
+    @property
+    def unavailable(self) -> bool:
+        """
+        Shared "endpoint unhealthy" signal: failures of any operation
+        count towards the endpoint breaker, and the jobs skip their
+        network work while it or the items listing breaker is open.
+        """
+        return self.endpoint_breaker.is_open or self.breaker("get_products").is_open
+
+    def open_breakers(self) -> list:
+        return [
+            breaker
+            for breaker in (self.endpoint_breaker, *self.breakers.values())
+            if breaker.is_open
+        ]
+
+    def _run(self, func, *args):
+        # runs in the worker thread; _post/_get flag unhealthy responses
+        self._local.failed = False
+        result = func(*args)
+        return result, self._local.failed
+
+    async def _call(self, func, *args, timeout=None, bucket=None, refused=None):
+        # `refused` is returned when a breaker keeps the request from
+        # being sent at all
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        operation = func.__name__.lstrip("_")
+        breaker = self.breaker(operation)
+
+        # refuse before taking a token, an outage should not eat the budget
+        allowed = self.endpoint_breaker.allow()
+        if allowed and not breaker.allow():
+            self.endpoint_breaker.abandon()
+            allowed = False
+        if not allowed:
+            metrics.inc("breaker_rejected_total", operation=operation)
+            logger.warning(f"{operation} skipped, circuit is open")
+            return refused
+
+        failed = None
+        try:
+            if bucket:
+                started = time.perf_counter()
+                await bucket.acquire()
+                metrics.observe(
+                    "throttle_seconds",
+                    time.perf_counter() - started,
+                    "throttle",
+                    operation=operation,
+                )
+
+            async with self.semaphore:
+                with metrics.span(
+                    "request", OPERATION_PHASES.get(operation), operation=operation
+                ) as span:
+                    future = loop.run_in_executor(
+                        self.executor, functools.partial(self._run, func, *args)
+                    )
+                    try:
+                        result, failed = await asyncio.wait_for(future, timeout)
+                    except asyncio.TimeoutError:
+                        logger.error(
+                            f"{func.__name__} timed out after {timeout} seconds"
+                        )
+                        result, failed = None, True
+                    except Exception:
+                        failed = True
+                        raise
+
+                    if result is None:
+                        span.fail()
+                    return result
+        finally:
+            for circuit in (self.endpoint_breaker, breaker):
+                if failed is None:
+                    circuit.abandon()
+                elif failed:
+                    circuit.record_failure()
+                else:
+                    circuit.record_success()
+
+    async def get_email_auth_code(self, email, timeout=None):
+        return await self._call(self._get_email_auth_code, email, timeout=timeout)
+
+    async def verify_email_code(self, email, code, timeout=None):
+        return await self._call(
+            self._verify_email_code, email, code, timeout=timeout
+        )
+
+    async def get_product(self, slug, timeout=None):
+        return await self._call(
+            self._get_product, slug, timeout=timeout, bucket=self.read_bucket
+        )
+
+    async def get_products(self, status_type="done", timeout=None):
+        page = await self.get_products_page(status_type, timeout=timeout)
+        return page.items if page else None
+
+    async def get_products_page(
+        self, status_type="done", cursor=None, page_size=16, timeout=None
+    ):
+        """
+        Fetch one page of the items listing. Pages are cached for
+        LISTING_CACHE_TTL seconds and identical concurrent requests share
+        a single call, so overlapping jobs do not repeat the query.
+        """
+        key = (
+            self.credentials.user_id,
+            tuple(ITEM_STATUSES.get(status_type, [])),
+            cursor,
+            page_size,
+        )
+        return await self.listing_cache.get_or_load(
+            key,
+            lambda: self._call(
+                self._get_products,
+                status_type,
+                cursor,
+                page_size,
+                timeout=timeout,
+                bucket=self.read_bucket,
+            ),
+        )
+
+    async def iter_products(
+        self, status_type="done", page_size=16, with_position=False, since=None
+    ):
+        """
+        Yield Items page by page following the page end cursor.
+        The next page is requested while the current one is consumed.
+        With with_position=True (item, position) pairs are yielded, where
+        position is the listing rank or None if the listing lacks it.
+        With since set, items created at or before it are skipped one at
+        a time, as the listing order is not guaranteed, and no page is
+        requested after one that lies wholly outside the window.
+        """
+        next_page = None
+        try:
+            page = await self.get_products_page(status_type, None, page_size)
+            while page:
+                past_window = (
+                    since is not None
+                    and page.items
+                    and all(item.created_at <= since for item in page.items)
+                )
+                if page.has_next_page and page.end_cursor and not past_window:
+                    next_page = asyncio.create_task(
+                        self.get_products_page(
+                            status_type, page.end_cursor, page_size
+                        )
+                    )
+
+                for item in page.items:
+                    if since is not None and item.created_at <= since:
+                        continue
+
+                    if with_position:
+                        yield item, item.position
+                    else:
+                        yield item
+
+                page = await next_page if next_page else None
+                next_page = None
+        finally:
+            if next_page and not next_page.done():
+                next_page.cancel()
+
+    async def get_priority_statuses(self, items, timeout=None):
+        """
+        Quote several (item_id, price) pairs and return {item_id: status}.
+        The status is False when the item has no priority statuses and
+        None when it could not be quoted. Cached quotes are reused, the
+        rest go out as batched requests when the endpoint accepts them,
+        otherwise as concurrent single quotes bounded by the client
+        semaphore and read budget. Batching is only turned off when the
+        endpoint rejects an array payload, not on a failed request.
+        """
+        statuses = {}
+        missing = []
+        for item_id, price in items:
+            self._track_quote_price(item_id, price)
+            quote = self.quote_cache.get((item_id, price))
+            if quote is None:
+                missing.append((item_id, price))
+            else:
+                statuses[item_id] = quote
+
+        if missing and self.batching_supported is not False:
+            for start in range(0, len(missing), priority_batch_size):
+                chunk = missing[start : start + priority_batch_size]
+                quotes = await self._call(
+                    self._get_priority_statuses_batch,
+                    chunk,
+                    timeout=timeout,
+                    bucket=self.read_bucket,
+                )
+                if quotes is False:
+                    logger.info("Batched requests are not supported, falling back")
+                    self.batching_supported = False
+                    break
+                if quotes is None:
+                    # a transient failure, quote the rest one at a time
+                    # this call only
+                    break
+
+                self.batching_supported = True
+                for (item_id, price), quote in zip(chunk, quotes):
+                    if quote is None:
+                        # quoted again below, one at a time
+                        continue
+                    statuses[item_id] = quote
+                    self.quote_cache.set((item_id, price), quote)
+
+        missing = [
+            (item_id, price) for item_id, price in missing if item_id not in statuses
+        ]
+        if missing:
+            quotes = await asyncio.gather(
+                *(
+                    self.get_priority_status(item_id, price, timeout=timeout)
+                    for item_id, price in missing
+                )
+            )
+            statuses.update(zip((item_id for item_id, _ in missing), quotes))
+
+        return statuses
+
+    async def get_position(self, item, position=None):
+        """
+        Return the listing rank of an item, requesting the item page only
+        when the items query did not include it.
+        """
+        if position is None:
+            position = item.position
+        if position is not None:
+            return position
+
+        logger.info(f"No position in listing for {item.slug}, requesting item")
+        product = await self.get_product(item.slug)
+        return product.get("sequence") if product else None
+
+    def _track_quote_price(self, item_id, price):
+        quoted = self.quoted_prices.get(item_id)
+        if quoted is not None and quoted != price:
+            self.quote_cache.discard((item_id, quoted))
+        self.quoted_prices[item_id] = price
+
+    def _forget_quote(self, item_id):
+        price = self.quoted_prices.pop(item_id, None)
+        if price is not None:
+            self.quote_cache.discard((item_id, price))
+
+    async def get_priority_status(self, item_id, price, timeout=None):
+        """
+        Quote the priority status for an item. Quotes are cached per
+        (item_id, price) and dropped as soon as the item price changes.
+        """
+        self._track_quote_price(item_id, price)
+        return await self.quote_cache.get_or_load(
+            (item_id, price),
+            lambda: self._call(
+                self._get_priority_status,
+                item_id,
+                price,
+                timeout=timeout,
+                bucket=self.read_bucket,
+            ),
+        )
+
+    async def make_transaction(self, item_id, priority_status_id, timeout=None):
+        """
+        Publish the item. Returns the item on success, False when the
+        publish was not sent or the server rejected it, and None when no
+        answer came back and it may have gone through.
+        """
+        result = await self._call(
+            self._make_transaction,
+            item_id,
+            priority_status_id,
+            timeout=timeout,
+            bucket=self.mutation_bucket,
+            refused=False,
+        )
+        if result:
+            # the item moved between listings or changed its position
+            self.listing_cache.invalidate()
+        else:
+            # the quoted status id may be stale, quote again next time
+            self._forget_quote(item_id)
+        return result
+
+    async def make_autolift(self, item_id, priority_status_id, timeout=None):
+        """
+        Lift the item. Returns the item on success, False when the lift
+        was not sent or the server rejected it, and None when no answer
+        came back and it may have gone through.
+        """
+        result = await self._call(
+            self._make_autolift,
+            item_id,
+            priority_status_id,
+            timeout=timeout,
+            bucket=self.mutation_bucket,
+            refused=False,
+        )
+        if result:
+            # the item moved between listings or changed its position
+            self.listing_cache.invalidate()
+        else:
+            # the quoted status id may be stale, quote again next time
+            self._forget_quote(item_id)
+        return result
+
+    def _check_response(self, response):
+        # server errors, rate limiting and anti-bot challenges mean the
+        # endpoint is unhealthy; other statuses are the request's problem
+        if response.status_code >= 500 or response.status_code in (403, 429):
+            self._local.failed = True
+        return response
+
+    def _post(self, payload, headers=None):
+        # take a consistent snapshot of the session, other jobs may rotate
+        # it from another worker thread while this request is in flight
+        with self.session_lock:
+            scraper, headers = self.scraper, {**self.headers, **(headers or {})}
+        if self.credentials.is_authorized:
+            headers["Cookie"] = self.credentials.cookie_header
+        return self._check_response(
+            scraper.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+        )
+
+    def _get(self, params):
+        with self.session_lock:
+            scraper, headers = self.scraper, self.headers.copy()
+        if self.credentials.is_authorized:
+            headers["Cookie"] = self.credentials.cookie_header
+        return self._check_response(
+            scraper.get(self.url, headers=headers, params=params, timeout=self.timeout)
+        )
+
+    def _rotate_session(self):
+        with self.session_lock:
+            self.scraper = cloudscraper.create_scraper()
+            self.headers["User-Agent"] = self.get_random_user_agent(
+                self.headers.get("User-Agent")
+            )
+            logger.info(f"User-Agent changed to: {self.headers['User-Agent']}")
+
+    def _get_email_auth_code(self, email):
         """
         Simulate sending an email to the user with a code.
         In a real application, this would send an email.
@@ -55,11 +528,11 @@ class Playerok:
         }
 
         logger.info(f"Sending email auth code request for email: {email}")
-        response = self.scraper.post(self.url, json=payload, headers=self.headers)
+        response = self._post(payload)
         logger.info(f"Response from getEmailAuthCode: {response.status_code}")
 
         if response.status_code == 200:
-            data = response.json()
+            data = decode(response)
             logger.debug(f"Response JSON: {data}")
             if "data" in data and "getEmailAuthCode" in data["data"]:
                 logger.info("Email auth code sent successfully.")
@@ -74,7 +547,7 @@ class Playerok:
             logger.error(f"Response content: {response.text}")
             return None
 
-    def verify_email_code(self, email, code):
+    def _verify_email_code(self, email, code):
         payload = {
             "operationName": "checkEmailAuthCode",
             "variables": {"input": {"code": code, "email": email}},
@@ -82,29 +555,20 @@ class Playerok:
         }
 
         logger.info(f"Verifying email code for email: {email}")
-        response = self.scraper.post(self.url, json=payload, headers=self.headers)
+        response = self._post(payload)
         logger.info(f"Response from checkEmailAuthCode: {response.status_code}")
         if response.status_code == 200:
-            data = response.json()
+            data = decode(response)
             if "data" in data and "checkEmailAuthCode" in data["data"]:
                 cookies = response.cookies.get_dict()
-                logger.info(f"Saving cookies to {self.storage_cookies_path}")
-                with open(self.storage_cookies_path, "w") as f:
-                    for key, value in cookies.items():
-                        f.write(f"{key}={value}\n")
-
-                logger.info("Saving user data to src/storage/user_data.json")
-                with open("src/storage/user_data.json", "w") as f:
-                    f.write(
-                        str(
-                            {
-                                "id": data["data"]["checkEmailAuthCode"]["id"],
-                                "username": data["data"]["checkEmailAuthCode"][
-                                    "username"
-                                ],
-                            }
-                        )
-                    )
+                logger.info("Saving cookies and user data")
+                self.credentials.save(
+                    cookies,
+                    {
+                        "id": data["data"]["checkEmailAuthCode"]["id"],
+                        "username": data["data"]["checkEmailAuthCode"]["username"],
+                    },
+                )
                 logger.info("Email code verified successfully.")
                 return data["data"]["checkEmailAuthCode"]
             else:
@@ -116,25 +580,20 @@ class Playerok:
             )
             return None
 
-    def get_product(self, slug):
+    def _get_product(self, slug):
         params = {
             "operationName": "item",
             "variables": f'{{"slug":"{slug}"}}',
             "extensions": '{"persistedQuery":{"version":1,"sha256Hash":"e359f060312bb73e464c78e153bbef81dc071bfa366eeefd5a730dd572c41ccb"}}'
         }
 
-        if not self.headers.get("Cookie") and os.path.exists(self.storage_cookies_path):
-            with open(self.storage_cookies_path, "r") as f:
-                cookies = [line.strip() for line in f if line.strip()]
-                self.headers["Cookie"] = "; ".join(cookies)
-
         logger.info(f"Requesting product details for slug: {slug} (GET request)")
-        response = self.scraper.get(self.url, headers=self.headers, params=params)
+        response = self._get(params)
         logger.info(f"Response from item query: {response.status_code}")
 
         if response.status_code == 200:
             logger.info("Successfully fetched product details.")
-            return response.json()["data"].get("item")
+            return decode(response)["data"].get("item")
         else:
             logger.error(
                 f"Failed to fetch product details. Status code: {response.status_code}"
@@ -142,61 +601,26 @@ class Playerok:
             logger.error(f"Response content: {response.text}")
             return None
 
-    def get_products(self, status_type="done"):
-        count = 0
-        with open("src/storage/count.txt", "a+") as f:
-            f.seek(0)
-            content = f.read().strip()
-            if content:
-                count = int(content)
-            else:
-                logger.warning("Count file is empty, initializing count to 0.")
-
-        if count >= 30:
-            self.scraper = cloudscraper.create_scraper()
-            self.headers["User-Agent"] = self.get_random_user_agent(
-                self.headers.get("User-Agent")
-            )
-            with open("src/storage/count.txt", "w") as f:
-                f.write("0")
-
-            logger.info(f"User-Agent changed to: {self.headers['User-Agent']}")
-
-        logger.info("Attempting to load cookies and user data for get_products.")
-        if not self.headers.get("Cookie") and os.path.exists(self.storage_cookies_path):
-            with open(self.storage_cookies_path, "r") as f:
-                cookies = [line.strip() for line in f if line.strip()]
-                self.headers["Cookie"] = "; ".join(cookies)
-
-        if not os.path.exists("src/storage/user_data.json"):
-            logger.error("User data file src/storage/user_data.json does not exist.")
-            return None
-
-        user_id = None
-        with open("src/storage/user_data.json", "r") as f:
-            user_data = f.read()
-            if not user_data:
-                logger.error("User data file is empty.")
-                return None
-            else:
-                user_data = eval(user_data)  # Convert string to dictionary
-                user_id = user_data.get("id", None)
+    def _get_products(self, status_type="done", cursor=None, page_size=16):
+        with self.session_lock:
+            if self.credentials.request_count >= 30:
+                self._rotate_session()
+                self.credentials.reset_requests()
+            count = self.credentials.increment_requests()
+            logger.info(f"Incremented count to {count}.")
 
+        user_id = self.credentials.user_id
         if not user_id:
             logger.error("User ID not found in user data.")
             return None
 
-        status = []
-        if status_type == "done":
-            status = ["DECLINED", "BLOCKED", "EXPIRED", "SOLD", "DRAFT"]
-        elif status_type == "active":
-            status = ["APPROVED", "PENDING_MODERATION", "PENDING_APPROVAL"]
+        status = ITEM_STATUSES.get(status_type, [])
 
         logger.info(f"Fetching products for user_id: {user_id}")
         payload = {
             "operationName": "items",
             "variables": {
-                "pagination": {"first": 16},
+                "pagination": {"first": page_size, "after": cursor},
                 "filter": {
                     "userId": user_id,
                     "status": status,
@@ -210,40 +634,27 @@ class Playerok:
             },
         }
 
-        headers = self.headers.copy()
-        headers["Referer"] = (
-            "https://playerok.com/profile/StanicaShop/products/completed"
-        )
-
-        with open("src/storage/count.txt", "w") as f:
-            count += 1
-            f.write(str(count))
-            logger.info(f"Incremented count to {count}.")
+        referer = {
+            "Referer": f"https://playerok.com/profile/{self.credentials.username}/products/completed"
+        }
 
-        response = self.scraper.post(self.url, json=payload, headers=self.headers)
-        logger.info(response.request.headers)
+        response = self._post(payload, headers=referer)
         logger.info(f"Response from items query: {response.status_code}")
         if response.status_code == 200:
             logger.info("Successfully fetched products.")
-            return response.json()["data"].get("items").get("edges")
+            items = decode(response)["data"].get("items")
+            return ItemsPage.from_response(items) if items else None
         else:
             logger.error(
                 f"Failed to fetch products. Status code: {response.status_code}"
             )
             logger.error(f"Response content: {response.text}")
-            self.scraper = (
-                cloudscraper.create_scraper()
-            )  # Recreate scraper to reset headers
-            self.headers["User-Agent"] = self.get_random_user_agent(
-                self.headers.get("User-Agent")
-            )
-            logger.info(
-                f"Retrying with a new User-Agent - {self.headers['User-Agent']}"
-            )
+            self._rotate_session()  # Recreate scraper to reset headers
             return None
 
-    def get_priority_status(self, item_id, price):
-        payload = {
+    @staticmethod
+    def _priority_status_payload(item_id, price):
+        return {
             "operationName": "itemPriorityStatuses",
             "variables": {
                 "itemId": item_id,
@@ -257,26 +668,90 @@ class Playerok:
             },
         }
 
+    @staticmethod
+    def _parse_priority_status(data):
+        # False when the server answered with no statuses for the item,
+        # None when the answer carries no list at all (an error)
+        statuses = (data.get("data") or {}).get("itemPriorityStatuses")
+        if statuses is None:
+            return None
+        return statuses[0] if statuses else False
+
+    def _get_priority_status(self, item_id, price):
+        payload = self._priority_status_payload(item_id, price)
+
         logger.info(
             f"Requesting priority status for item_id: {item_id} with price: {price}"
         )
-        response = self.scraper.post(self.url, json=payload, headers=self.headers)
+        response = self._post(payload)
         logger.info(f"Response from itemPriorityStatuses: {response.status_code}")
         if response.status_code == 200:
-            data = response.json()
-            if "data" in data and "itemPriorityStatuses" in data["data"]:
+            status = self._parse_priority_status(decode(response))
+            if status:
                 logger.info("Successfully retrieved priority status.")
-                return data["data"]["itemPriorityStatuses"][0]
             else:
                 logger.warning("itemPriorityStatuses not found in response.")
-                return None
+            return status
         else:
             logger.error(
                 f"Failed to get priority status. Status code: {response.status_code}"
             )
             return None
 
-    def make_transaction(self, item_id, priority_status_id):
+    def _get_priority_statuses_batch(self, items):
+        """
+        Send several itemPriorityStatuses operations as one array payload.
+        Returns statuses in the order of items, False when the endpoint
+        rejects array payloads and None on any other failure.
+        """
+        payload = [
+            self._priority_status_payload(item_id, price) for item_id, price in items
+        ]
+
+        logger.info(f"Requesting priority statuses for {len(items)} items in one batch")
+        response = self._post(payload)
+        logger.info(f"Response from batched itemPriorityStatuses: {response.status_code}")
+        if response.status_code == 400:
+            return False
+        if response.status_code != 200:
+            return None
+
+        try:
+            data = decode(response)
+        except ValueError:
+            return None
+
+        if not isinstance(data, list):
+            return False
+        if len(data) != len(items):
+            return None
+        return [self._parse_priority_status(entry) for entry in data]
+
+    def _post_persisted(self, payload, query):
+        """
+        Send a mutation as a persisted query and register the document
+        only when the server does not know the hash yet.
+        """
+        payload["extensions"] = {
+            "persistedQuery": {
+                "version": 1,
+                "sha256Hash": hashlib.sha256(query.encode()).hexdigest(),
+            }
+        }
+        response = self._post(payload)
+
+        if response.status_code in (200, 400) and is_persisted_query_not_found(
+            response
+        ):
+            logger.info(
+                f"Persisted query for {payload['operationName']} not found, "
+                "retrying with the full document"
+            )
+            response = self._post({**payload, "query": query})
+
+        return response
+
+    def _make_transaction(self, item_id, priority_status_id):
         logger.info(
             f"Initiating transaction for item_id: {item_id} with priority_status_id: {priority_status_id}"
         )
@@ -290,20 +765,24 @@ class Playerok:
                     "itemId": item_id,
                 }
             },
-            "query": "mutation publishItem($input: PublishItemInput!) { publishItem(input: $input) { ...RegularItem __typename } } fragment RegularItem on Item { ...RegularMyItem ...RegularForeignItem __typename } fragment RegularMyItem on MyItem { ...ItemFields prevPrice priority sequence priorityPrice statusExpirationDate comment viewsCounter statusDescription editable statusPayment { ...StatusPaymentTransaction __typename } moderator { id username __typename } approvalDate deletedAt createdAt updatedAt mayBePublished prevFeeMultiplier sellerNotifiedAboutFeeChange __typename } fragment ItemFields on Item { id slug name description rawPrice price attributes status priorityPosition sellerType feeMultiplier user { ...ItemUser __typename } buyer { ...ItemUser __typename } attachments { ...PartialFile __typename } category { ...RegularGameCategory __typename } game { ...RegularGameProfile __typename } comment dataFields { ...GameCategoryDataFieldWithValue __typename } obtainingType { ...GameCategoryObtainingType __typename } __typename } fragment ItemUser on UserFragment { ...UserEdgeNode __typename } fragment UserEdgeNode on UserFragment { ...RegularUserFragment __typename } fragment RegularUserFragment on UserFragment { id username role avatarURL isOnline isBlocked rating testimonialCounter createdAt supportChatId systemChatId __typename } fragment PartialFile on File { id url __typename } fragment RegularGameCategory on GameCategory { id slug name categoryId gameId obtaining options { ...RegularGameCategoryOption __typename } props { ...GameCategoryProps __typename } noCommentFromBuyer instructionForBuyer instructionForSeller useCustomObtaining autoConfirmPeriod autoModerationMode agreements { ...RegularGameCategoryAgreement __typename } feeMultiplier __typename } fragment RegularGameCategoryOption on GameCategoryOption { id group label type field value valueRangeLimit { min max __typename } __typename } fragment GameCategoryProps on GameCategoryPropsObjectType { minTestimonials minTestimonialsForSeller __typename } fragment RegularGameCategoryAgreement on GameCategoryAgreement { description gameCategoryId gameCategoryObtainingTypeId iconType id sequence __typename } fragment RegularGameProfile on GameProfile { id name type slug logo { ...PartialFile __typename } __typename } fragment GameCategoryDataFieldWithValue on GameCategoryDataFieldWithValue { id label type inputType copyable hidden required value __typename } fragment GameCategoryObtainingType on GameCategoryObtainingType { id name description gameCategoryId noCommentFromBuyer instructionForBuyer instructionForSeller sequence feeMultiplier agreements { ...MinimalGameCategoryAgreement __typename } props { minTestimonialsForSeller __typename } __typename } fragment MinimalGameCategoryAgreement on GameCategoryAgreement { description iconType id sequence __typename } fragment StatusPaymentTransaction on Transaction { id operation direction providerId status statusDescription statusExpirationDate value props { paymentURL __typename } __typename } fragment RegularForeignItem on ForeignItem { ...ItemFields __typename }",
         }
-        response = self.scraper.post(self.url, json=payload, headers=self.headers)
+        response = self._post_persisted(payload, PUBLISH_ITEM_QUERY)
         logger.info(f"Response from publishItem: {response.status_code}")
         if response.status_code == 200:
-            logger.info("Transaction completed successfully.")
-            return response.json()
+            data = decode(response)
+            item = (data.get("data") or {}).get("publishItem")
+            if item:
+                logger.info("Transaction completed successfully.")
+                return item
+            logger.error(f"publishItem returned errors: {data.get('errors')}")
+            return False
         else:
             logger.error(
                 f"Failed to complete transaction. Status code: {response.status_code}"
             )
-            return None
+            return mutation_outcome(response)
 
-    def make_autolift(self, item_id, priority_status_id):
+    def _make_autolift(self, item_id, priority_status_id):
         payload = {
             "operationName": "increaseItemPriorityStatus",
             "variables": {
@@ -314,17 +793,23 @@ class Playerok:
                     "transactionProviderId": "LOCAL",
                 }
             },
-            "query": "mutation increaseItemPriorityStatus($input: PublishItemInput!) { increaseItemPriorityStatus(input: $input) { ...RegularItem __typename } } fragment RegularItem on Item { ...RegularMyItem ...RegularForeignItem __typename } fragment RegularMyItem on MyItem { ...ItemFields prevPrice priority sequence priorityPrice statusExpirationDate comment viewsCounter statusDescription editable statusPayment { ...StatusPaymentTransaction __typename } moderator { id username __typename } approvalDate deletedAt createdAt updatedAt mayBePublished prevFeeMultiplier sellerNotifiedAboutFeeChange __typename } fragment ItemFields on Item { id slug name description rawPrice price attributes status priorityPosition sellerType feeMultiplier user { ...ItemUser __typename } buyer { ...ItemUser __typename } attachments { ...PartialFile __typename } category { ...RegularGameCategory __typename } game { ...RegularGameProfile __typename } comment dataFields { ...GameCategoryDataFieldWithValue __typename } obtainingType { ...GameCategoryObtainingType __typename } __typename } fragment ItemUser on UserFragment { ...UserEdgeNode __typename } fragment UserEdgeNode on UserFragment { ...RegularUserFragment __typename } fragment RegularUserFragment on UserFragment { id username role avatarURL isOnline isBlocked rating testimonialCounter createdAt supportChatId systemChatId __typename } fragment PartialFile on File { id url __typename } fragment RegularGameCategory on GameCategory { id slug name categoryId gameId obtaining options { ...RegularGameCategoryOption __typename } props { ...GameCategoryProps __typename } noCommentFromBuyer instructionForBuyer instructionForSeller useCustomObtaining autoConfirmPeriod autoModerationMode agreements { ...RegularGameCategoryAgreement __typename } feeMultiplier __typename } fragment RegularGameCategoryOption on GameCategoryOption { id group label type field value valueRangeLimit { min max __typename } __typename } fragment GameCategoryProps on GameCategoryPropsObjectType { minTestimonials minTestimonialsForSeller __typename } fragment RegularGameCategoryAgreement on GameCategoryAgreement { description gameCategoryId gameCategoryObtainingTypeId iconType id sequence __typename } fragment RegularGameProfile on GameProfile { id name type slug logo { ...PartialFile __typename } __typename } fragment GameCategoryDataFieldWithValue on GameCategoryDataFieldWithValue { id label type inputType copyable hidden required value __typename } fragment GameCategoryObtainingType on GameCategoryObtainingType { id name description gameCategoryId noCommentFromBuyer instructionForBuyer instructionForSeller sequence feeMultiplier agreements { ...MinimalGameCategoryAgreement __typename } props { minTestimonialsForSeller __typename } __typename } fragment MinimalGameCategoryAgreement on GameCategoryAgreement { description iconType id sequence __typename } fragment StatusPaymentTransaction on Transaction { id operation direction providerId status statusDescription statusExpirationDate value props { paymentURL __typename } __typename } fragment RegularForeignItem on ForeignItem { ...ItemFields __typename }",
         }
 
-        response = self.scraper.post(self.url, json=payload, headers=self.headers)
+        response = self._post_persisted(payload, INCREASE_ITEM_PRIORITY_STATUS_QUERY)
         logger.info(f"Response from autoliftItem: {response.status_code}")
 
         if response.status_code == 200:
-            logger.info("Autolift request completed successfully.")
-            return response.json()
+            data = decode(response)
+            item = (data.get("data") or {}).get("increaseItemPriorityStatus")
+            if item:
+                logger.info("Autolift request completed successfully.")
+                return item
+            logger.error(
+                f"increaseItemPriorityStatus returned errors: {data.get('errors')}"
+            )
+            return False
         else:
             logger.error(
                 f"Failed to autolift item. Status code: {response.status_code}"
             )
-            return None
+            return mutation_outcome(response)
@@ -13,15 +13,14 @@ from handlers import router
 from common import set_admin_commands
 from config import token, admin_list
 from cron import scheduler
+from metrics import metrics
+from logconfig import setup_logging
+import jobs
 
 # Create directories if they don't exist
 os.makedirs("logs", exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("logs/bot.log"), logging.StreamHandler()],
-)
+log_listener = setup_logging("logs/bot.log")
 logger = logging.getLogger(__name__)
 
 bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
@@ -37,10 +36,18 @@ async def on_startup():
     # if you want to clear your database, delete the comment await drop_dp()
     # await drop_db()
     await create_db()
+    # jobs are loaded paused, so that old jobs are migrated before they run
+    scheduler.start(paused=True)  # запуск шедулера
+    await jobs.setup(bot)
+    scheduler.resume()
+    await metrics.start_exporter()
 
 
 async def on_shutdown():
+    await jobs.notifier.stop()
+    await metrics.stop_exporter()
     logger.info("Bot down")
+    log_listener.stop()
 
 
 async def main():
@@ -49,7 +56,6 @@ async def main():
 
     dp.update.middleware(DataBaseSession(session_pool=session_maker))
 
-    scheduler.start()  # запуск шедулера
 
     await bot.delete_webhook(drop_pending_updates=True)
 
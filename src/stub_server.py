@@ -0,0 +1,235 @@
+"""
+Local stand-in for the playerok.com /graphql endpoint.
+
+Serves items, item, itemPriorityStatuses, publishItem and
+increaseItemPriorityStatus from a generated catalog, with configurable
+latency and error rate, so the jobs can be exercised offline.
+
+    python src/stub_server.py --items 500 --latency 80 --error-rate 0.01
+"""
+import json
+import random
+import asyncio
+import argparse
+import logging
+
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS = ["алмази", "gems", "points", "бобр", "акція"]
+DONE_STATUSES = ["DECLINED", "EXPIRED", "SOLD"]
+ACTIVE_STATUSES = ["APPROVED"]
+
+
+def generate_catalog(size: int, user_id: str = "stub-user", hours: float = 40):
+    """
+    Build `size` items newest first, spread over the last `hours` hours,
+    alternating between finished and active statuses.
+    """
+    now = datetime.now(timezone.utc)
+    catalog = []
+    for index in range(size):
+        created_at = now - timedelta(seconds=hours * 3600 * index / max(size, 1))
+        statuses = DONE_STATUSES if index % 2 else ACTIVE_STATUSES
+        item_id = f"{user_id}-item-{index}"
+        catalog.append(
+            {
+                "id": item_id,
+                "slug": f"{index:06d}-stub-item",
+                "name": f"{random.choice(KEYWORDS)} #{index}",
+                "rawPrice": random.randint(50, 5000),
+                "status": statuses[index % len(statuses)],
+                "sequence": random.randint(1, 400),
+                "priorityPosition": None,
+                "createdAt": created_at.isoformat().replace("+00:00", "Z"),
+                "updatedAt": created_at.isoformat().replace("+00:00", "Z"),
+                "attachment": {"url": f"https://example.invalid/{item_id}.jpg"},
+                "user": {"id": user_id},
+                "__typename": "MyItem",
+            }
+        )
+    return catalog
+
+
+class StubServer:
+    def __init__(
+        self,
+        catalog: list,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        batching: bool = True,
+    ):
+        self.catalog = catalog
+        self.by_slug = {item["slug"]: item for item in catalog}
+        self.by_id = {item["id"]: item for item in catalog}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.batching = batching
+        self.persisted = set()
+        self.requests = Counter()
+        self.operations = Counter()
+        self.runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/graphql", self.handle_post)
+        self.app.router.add_get("/graphql", self.handle_get)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/graphql"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def _delay(self):
+        if self.latency:
+            spread = self.latency * self.jitter
+            await asyncio.sleep(max(0, random.uniform(-spread, spread) + self.latency))
+
+    def _failed(self) -> bool:
+        return random.random() < self.error_rate
+
+    async def handle_get(self, request: web.Request):
+        self.requests["GET"] += 1
+        await self._delay()
+        if self._failed():
+            return web.Response(status=502, text="Bad Gateway")
+
+        payload = {
+            "operationName": request.query.get("operationName"),
+            "variables": json.loads(request.query.get("variables", "{}")),
+        }
+        return web.json_response(self.execute(payload))
+
+    async def handle_post(self, request: web.Request):
+        self.requests["POST"] += 1
+        await self._delay()
+        if self._failed():
+            return web.Response(status=502, text="Bad Gateway")
+
+        body = await request.json()
+        if isinstance(body, list):
+            if not self.batching:
+                return web.json_response(
+                    {"errors": [{"message": "Batching is not supported"}]}, status=400
+                )
+            return web.json_response([self.execute(payload) for payload in body])
+        return web.json_response(self.execute(body))
+
+    def execute(self, payload: dict) -> dict:
+        operation = payload.get("operationName")
+        variables = payload.get("variables") or {}
+        self.operations[operation] += 1
+
+        if operation == "items":
+            return {"data": {"items": self.items(variables)}}
+        if operation == "item":
+            return {"data": {"item": self.by_slug.get(variables.get("slug"))}}
+        if operation == "itemPriorityStatuses":
+            price = variables.get("price") or 0
+            return {
+                "data": {
+                    "itemPriorityStatuses": [
+                        {"id": "premium", "price": max(10, price // 20), "type": "PREMIUM"},
+                        {"id": "default", "price": 0, "type": "DEFAULT"},
+                    ]
+                }
+            }
+        if operation in ("publishItem", "increaseItemPriorityStatus"):
+            return self.mutate(operation, payload)
+        return {"errors": [{"message": f"Unknown operation {operation}"}]}
+
+    def items(self, variables: dict) -> dict:
+        pagination = variables.get("pagination") or {}
+        filters = variables.get("filter") or {}
+        statuses = set(filters.get("status") or [])
+        first = pagination.get("first") or 16
+
+        # cursors are catalog positions, so they stay valid when items
+        # change status between pages
+        after = int(pagination.get("after") or -1)
+        matching = [
+            (index, item)
+            for index, item in enumerate(self.catalog)
+            if index > after and (not statuses or item["status"] in statuses)
+        ]
+        page = matching[:first]
+        return {
+            "edges": [{"node": item, "cursor": str(index)} for index, item in page],
+            "pageInfo": {
+                "endCursor": str(page[-1][0]) if page else None,
+                "hasNextPage": len(matching) > first,
+            },
+            "totalCount": len(matching),
+        }
+
+    def mutate(self, operation: str, payload: dict) -> dict:
+        sha = ((payload.get("extensions") or {}).get("persistedQuery") or {}).get("sha256Hash")
+        if payload.get("query"):
+            self.persisted.add(sha)
+        elif sha not in self.persisted:
+            return {
+                "errors": [
+                    {
+                        "message": "PersistedQueryNotFound",
+                        "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+                    }
+                ]
+            }
+
+        item = self.by_id.get(payload["variables"]["input"]["itemId"])
+        if not item:
+            return {"errors": [{"message": "Item not found"}], "data": {operation: None}}
+
+        if operation == "publishItem":
+            item["status"] = "APPROVED"
+        item["sequence"] = 1
+        return {
+            "data": {
+                operation: {
+                    "id": item["id"],
+                    "status": item["status"],
+                    "priorityPosition": item["sequence"],
+                    "__typename": "MyItem",
+                }
+            }
+        }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=50, help="mean latency, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-batching", action="store_true")
+    args = parser.parse_args()
+
+    server = StubServer(
+        generate_catalog(args.items),
+        latency=args.latency / 1000,
+        error_rate=args.error_rate,
+        batching=not args.no_batching,
+    )
+    url = await server.start(args.host, args.port)
+    logger.info(f"Stub GraphQL endpoint listening on {url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
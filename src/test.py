@@ -1,6 +1,8 @@
 import asyncio
 from playerok import Playerok
 from utils import autolift_products
+from keywords import StaticKeywordStore
+from notifier import notifier
 import logging
 
 logging.basicConfig(
@@ -10,19 +12,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 playerok = Playerok()
-keywords = [
-    {"keyword": "test1", "position": 250},
-    {"keyword": "bobr", "position": 20},
-    {"keyword": "обычный", "position": 20},
-    {"keyword": "points", "position": 300},
-]
+keywords = StaticKeywordStore(
+    [
+        ("test1", 250),
+        ("bobr", 20),
+        ("обычный", 20),
+        ("points", 300),
+    ]
+)
 
 
 async def main():
-    test = playerok.get_product("5b57d577f1b2-ezhednevnyy-usilitel-b-vypolnyayu-bystro")
+    test = await playerok.get_product("5b57d577f1b2-ezhednevnyy-usilitel-b-vypolnyayu-bystro")
     
     # print(test["sequence"])
-    await autolift_products(playerok, keywords)
+    await autolift_products(playerok, keywords, notifier, admin_ids=[])
 
 
 if __name__ == "__main__":
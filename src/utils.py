@@ -1,223 +1,469 @@
+import html
 import logging
-import random
 import time
 import traceback
-import asyncio
 
-from aiogram import Bot
+from contextlib import aclosing
 from playerok import Playerok
 from datetime import datetime, timezone, timedelta
-from keyboards import get_url_btns
-from config import site_url
+from keywords import KeywordStore
+from ledger import ledger
+from notifier import Notifier
+from metrics import metrics
+from journal import mutation_journal
+from dataclasses import dataclass
+from items import Item
+from budget import spend_budget
+from config import priority_batch_size, site_url
+
+# items listed per group in the autolift summary
+SUMMARY_ITEMS = 20
+
+# deferred item ids of the last autolift summary sent per account
+_deferred_notified = {}
 
 logger = logging.getLogger(__name__)
 
 
+@metrics.traced("reupload")
 async def reupload_products(
     playerok: Playerok,
-    keywords: list,
-    bot: Bot,
+    keywords: KeywordStore,
+    notifier: Notifier,
     admin_ids: list,
 ):
     try:
-        await random_sleep(20, 60)
-        products = playerok.get_products()
+        keywords = await keywords.get()
+        if not keywords:
+            logger.warning("No keywords for reupload, skipping cycle.")
+            return 0
 
-        if not products:
-            logger.warning("No products retrieved from playerok.")
-            return
+        if playerok.unavailable:
+            logger.warning("Playerok is unavailable (circuit open), skipping reupload cycle.")
+            metrics.inc("cycles_skipped_total", job="reupload", reason="circuit_open")
+            return 0
 
-        logger.info("Starting reupload process for %d products.", len(products))
-        for product in products:
-            created_at = datetime.fromisoformat(
-                product["node"]["createdAt"].replace("Z", "+00:00")
-            )
-            product_name = product["node"]["name"]
-            product_id = product["node"]["id"]
+        await mutation_journal.refresh(playerok)
 
-            if created_at > datetime.now(timezone.utc) - timedelta(hours=48):
-                logging.info(created_at)
-                if any(keyword.lower() in product_name.lower() for keyword in keywords):
-                    priority_status = playerok.get_priority_status(
-                        product_id,
-                        product["node"]["rawPrice"],
-                    )
-                    if not priority_status:
-                        logger.info(
-                            "Product '%s' (ID: %s) is not in priority status. Skipping.",
-                            product_name,
-                            product_id,
-                        )
-                        continue
-
-                    transaction = playerok.make_transaction(
+        window_start = datetime.now(timezone.utc) - timedelta(hours=48)
+        processed = 0
+        candidates = []
+
+        logger.info("Starting reupload process.")
+        async with aclosing(
+            playerok.iter_products(since=window_start)
+        ) as products:
+            async for product in products:
+                product_name = product.name
+                product_id = product.id
+
+                processed += 1
+                with metrics.phase("match"):
+                    matched = keywords.match(product.name_folded, normalized=True)
+                if not matched:
+                    logger.info(
+                        "Product '%s' (ID: %s) does not match keywords. Skipping.",
+                        product_name,
                         product_id,
-                        priority_status["id"],
                     )
+                    continue
 
-                    if transaction:
-                        logger.info(
-                            "Product '%s' (ID: %s) reuploaded successfully.",
-                            product_name,
-                            product_id,
-                        )
-                        for admin_id in admin_ids:
-                            try:
-                                await bot.send_photo(
-                                    chat_id=admin_id,
-                                    photo=product["node"]["attachment"]["url"],
-                                    reply_markup=get_url_btns(
-                                        btns={
-                                            "ТОВАР ВИСТАВЛЕНИЙ": f"{site_url}/products/{product['node']['slug']}"
-                                        },
-                                        sizes=(1,),
-                                    ),
-                                )
-                                logger.info(
-                                    "Notification sent to admin %s for product '%s' (ID: %s).",
-                                    admin_id,
-                                    product_name,
-                                    product_id,
-                                )
-                            except Exception as e:
-                                logger.warning(
-                                    "Failed to notify admin %s for product '%s' (ID: %s): %s",
-                                    admin_id,
-                                    product_name,
-                                    product_id,
-                                    e,
-                                )
-                    else:
-                        logger.warning(
-                            "Failed to reupload product '%s' (ID: %s).",
-                            product_name,
-                            product_id,
-                        )
-                else:
+                if await ledger.is_recent(product_id, "reupload"):
                     logger.info(
-                        "Product '%s' (ID: %s) does not match keywords. Skipping.",
+                        "Product '%s' (ID: %s) was handled recently. Skipping.",
                         product_name,
                         product_id,
                     )
-                await random_sleep()
-        logger.info("Reupload process completed.")
+                    continue
+
+                candidates.append(product)
+                metrics.inc("items_total", job="reupload", outcome="matched")
+                if len(candidates) >= priority_batch_size:
+                    await reupload_batch(playerok, candidates, notifier, admin_ids)
+                    candidates = []
+
+        await reupload_batch(playerok, candidates, notifier, admin_ids)
+
+        metrics.inc("items_total", processed, job="reupload", outcome="processed")
+        if not processed:
+            logger.warning("No products retrieved from playerok.")
+            return processed
+
+        logger.info("Reupload process completed for %d products.", processed)
+        return processed
 
     except Exception as e:
         logger.error("Exception during reupload_products: %s", e, exc_info=True)
 
+    finally:
+        notifier.flush()
+
+
+def journal_state(transaction) -> str:
+    # False: not sent or rejected by the server, None: no answer
+    if transaction:
+        return "applied"
+    return "not_applied" if transaction is False else "unknown"
+
+
+async def settle_unresolved(playerok: Playerok, products: list, action: str) -> list:
+    """
+    Drop the products whose previous paid mutation may have gone through,
+    reconciling them with the item state first.
+    """
+    settled = []
+    for product in products:
+        entry = mutation_journal.unresolved(product.id, action)
+        if entry and await mutation_journal.reconcile(playerok, entry) != "not_applied":
+            logger.info(
+                "Product '%s' (ID: %s) has an unconfirmed %s. Skipping.",
+                product.name,
+                product.id,
+                action,
+            )
+            continue
+        settled.append(product)
+    return settled
+
+
+async def reupload_batch(
+    playerok: Playerok,
+    products: list,
+    notifier: Notifier,
+    admin_ids: list,
+):
+    products = await settle_unresolved(playerok, products, "reupload")
+    if not products:
+        return
+
+    priority_statuses = await playerok.get_priority_statuses(
+        [(product.id, product.raw_price) for product in products]
+    )
+
+    for product in products:
+        product_name = product.name
+        product_id = product.id
+
+        if playerok.unavailable:
+            logger.warning("Playerok became unavailable (circuit open), stopping reupload.")
+            metrics.inc("cycles_skipped_total", job="reupload", reason="circuit_open")
+            return
+
+        priority_status = priority_statuses.get(product_id)
+        if priority_status is None:
+            # the quote failed, try again next cycle
+            logger.warning(
+                "Failed to quote product '%s' (ID: %s). Skipping.",
+                product_name,
+                product_id,
+            )
+            metrics.inc("items_total", job="reupload", outcome="quote_failed")
+            continue
+
+        if not priority_status:
+            logger.info(
+                "Product '%s' (ID: %s) is not in priority status. Skipping.",
+                product_name,
+                product_id,
+            )
+            await ledger.record(
+                product_id, "reupload", "no_priority_status", product.raw_price
+            )
+            metrics.inc("items_total", job="reupload", outcome="no_priority_status")
+            continue
+
+        entry = await mutation_journal.begin(
+            product,
+            "reupload",
+            priority_status["id"],
+            account_pk=getattr(playerok.credentials, "account_pk", None),
+        )
+        transaction = await playerok.make_transaction(
+            product_id,
+            priority_status["id"],
+        )
+        await mutation_journal.finish(entry, journal_state(transaction))
+
+        if transaction:
+            # only definite outcomes go to the ledger; an unconfirmed
+            # publish is reconciled by the journal next cycle
+            await ledger.record(product_id, "reupload", "published", product.raw_price)
+            logger.info(
+                "Product '%s' (ID: %s) reuploaded successfully.",
+                product_name,
+                product_id,
+            )
+            metrics.inc("items_total", job="reupload", outcome="mutated")
+            with metrics.phase("notify"):
+                notifier.notify(admin_ids, product, "ТОВАР ВИСТАВЛЕНИЙ")
+        else:
+            metrics.inc("items_total", job="reupload", outcome="failed")
+            logger.warning(
+                "Failed to reupload product '%s' (ID: %s).",
+                product_name,
+                product_id,
+            )
+
+
+@dataclass(slots=True)
+class Candidate:
+    product: Item
+    sequence: int
+    target: int
+    priority_status: dict = None
+    cost: int = 0
+
+    @property
+    def deficit(self) -> int:
+        # positions between the item and its keyword target
+        return self.sequence - self.target
+
+    @property
+    def score(self) -> float:
+        return self.deficit / max(self.cost, 1)
 
+
+@metrics.traced("autolift")
 async def autolift_products(
     playerok: Playerok,
-    keywords: list,
-    bot: Bot,
+    keywords: KeywordStore,
+    notifier: Notifier,
     admin_ids: list,
 ):
     try:
-        await random_sleep(20, 60)
-        products = playerok.get_products(status_type="active")
+        keywords = await keywords.get()
+        if not keywords:
+            logger.warning("No keywords for autolift, skipping cycle.")
+            return 0
 
-        if not products:
-            logger.warning("No products retrieved from playerok.")
-            return
+        if playerok.unavailable:
+            logger.warning("Playerok is unavailable (circuit open), skipping autolift cycle.")
+            metrics.inc("cycles_skipped_total", job="autolift", reason="circuit_open")
+            return 0
 
-        logger.info("Starting autolift process for %d products.", len(products))
-        for product in products:
-            created_at = datetime.fromisoformat(
-                product["node"]["createdAt"].replace("Z", "+00:00")
+        await mutation_journal.refresh(playerok)
+
+        window_start = datetime.now(timezone.utc) - timedelta(hours=72)
+        processed = 0
+        candidates = []
+
+        logger.info("Starting autolift process.")
+        async with aclosing(
+            playerok.iter_products(
+                status_type="active", with_position=True, since=window_start
             )
-            product_name = product["node"]["name"]
-            product_id = product["node"]["id"]
-            product_slug = product["node"]["slug"]
-
-            if created_at > datetime.now(timezone.utc) - timedelta(hours=72):
-                logging.info(created_at)
-
-                for keyword in keywords:
-                    if keyword["keyword"].lower() in product_name.lower():
-                        product_data = playerok.get_product(product_slug)
-
-                        if not product_data:
-                            logger.warning(
-                                "Product '%s' (ID: %s) not found in playerok. Skipping.",
-                                product_name,
-                                product_id,
-                            )
-                            continue
-
-                        product_sequence = product_data.get("sequence", None)
-
-                        if not product_sequence:
-                            logger.warning(
-                                f"Product '{product_name}' (ID: {product_id}) has no sequence data. Skipping."
-                            )
-                            continue
-
-                        logger.info(f"Keyword position {keyword['position']} - current sequence {product_sequence}")
-
-                        if product_sequence > keyword["position"]:
-                            priority_status = playerok.get_priority_status(
-                                product_id,
-                                product["node"]["rawPrice"],
-                            )
-
-                            if not priority_status:
-                                logger.info(
-                                    "Product '%s' (ID: %s) is not in priority status. Skipping.",
-                                    product_name,
-                                    product_id,
-                                )
-                                continue
-
-                            transaction = playerok.make_autolift(
-                                product_id,
-                                priority_status["id"],
-                            )
-
-                            if transaction:
-                                logger.info(
-                                    "Product '%s' (ID: %s) autolifted successfully.",
-                                    product_name,
-                                    product_id,
-                                )
-                                for admin_id in admin_ids:
-                                    try:
-                                        await bot.send_photo(
-                                            chat_id=admin_id,
-                                            photo=product["node"]["attachment"]["url"],
-                                            reply_markup=get_url_btns(
-                                                btns={
-                                                    "ТОВАР ПІДНЯТИЙ В ТОП": f"{site_url}/products/{product['node']['slug']}"
-                                                },
-                                                sizes=(1,),
-                                            ),
-                                        )
-                                        logger.info(
-                                            "Notification sent to admin %s for product '%s' (ID: %s).",
-                                            admin_id,
-                                            product_name,
-                                            product_id,
-                                        )
-                                    except Exception as e:
-                                        logger.warning(
-                                            "Failed to notify admin %s for product '%s' (ID: %s): %s",
-                                            admin_id,
-                                            product_name,
-                                            product_id,
-                                            e,
-                                        )
-                            else:
-                                logger.warning(
-                                    "Failed to autolift product '%s' (ID: %s).",
-                                    product_name,
-                                )
+        ) as products:
+            async for product, listing_position in products:
+                product_name = product.name
+                product_id = product.id
+
+                processed += 1
+
+                with metrics.phase("match"):
+                    target_position = keywords.strictest_position(
+                        product.name_folded, normalized=True
+                    )
+                if target_position is None:
+                    continue
+
+                product_sequence = await playerok.get_position(
+                    product, listing_position
+                )
+
+                if not product_sequence:
+                    logger.warning(
+                        f"Product '{product_name}' (ID: {product_id}) has no sequence data. Skipping."
+                    )
+                    continue
+
+                logger.info(f"Keyword position {target_position} - current sequence {product_sequence}")
+
+                if product.position is None:
+                    # kept for the mutation journal to compare against
+                    product.position = product_sequence
+
+                if product_sequence > target_position:
+                    candidates.append(
+                        Candidate(product, product_sequence, target_position)
+                    )
+                    metrics.inc("items_total", job="autolift", outcome="matched")
+
+        await autolift_plan(playerok, candidates, notifier, admin_ids)
+
+        metrics.inc("items_total", processed, job="autolift", outcome="processed")
+        if not processed:
+            logger.warning("No products retrieved from playerok.")
+            return processed
+
+        logger.info("Autolift process completed for %d products.", processed)
+        return processed
+
     except Exception as e:
         logger.error("Exception during autolift_products: %s", e, exc_info=True)
 
+    finally:
+        notifier.flush()
+
 
-async def random_sleep(min_seconds=5, max_seconds=10):
+def plan_autolifts(candidates: list, remaining) -> tuple:
     """
-    Sleep for a random duration between min_seconds and max_seconds.
+    Rank quoted candidates by positions regained per unit spent and pick
+    greedily while they fit into the remaining budget (None means no
+    limit). Returns (planned, deferred).
     """
-    sleep_time = random.uniform(min_seconds, max_seconds)
-    logger.info(f"Sleeping for {sleep_time:.2f} seconds.")
-    await asyncio.sleep(sleep_time)
+    planned, deferred = [], []
+    for candidate in sorted(candidates, key=lambda c: c.score, reverse=True):
+        if remaining is None or candidate.cost <= remaining:
+            planned.append(candidate)
+            if remaining is not None:
+                remaining -= candidate.cost
+        else:
+            deferred.append(candidate)
+    return planned, deferred
+
+
+async def autolift_plan(
+    playerok: Playerok,
+    candidates: list,
+    notifier: Notifier,
+    admin_ids: list,
+):
+    settled = {
+        product.id
+        for product in await settle_unresolved(
+            playerok, [candidate.product for candidate in candidates], "autolift"
+        )
+    }
+    candidates = [c for c in candidates if c.product.id in settled]
+    if not candidates:
+        return
+
+    priority_statuses = await playerok.get_priority_statuses(
+        [(c.product.id, c.product.raw_price) for c in candidates]
+    )
+
+    quoted = []
+    for candidate in candidates:
+        priority_status = priority_statuses.get(candidate.product.id)
+        if not priority_status:
+            logger.info(
+                "Product '%s' (ID: %s) is not in priority status. Skipping.",
+                candidate.product.name,
+                candidate.product.id,
+            )
+            metrics.inc("items_total", job="autolift", outcome="no_priority_status")
+            continue
+        if priority_status.get("price") is None:
+            # can't be weighed against the budget, quoted again next cycle
+            logger.warning(
+                "Product '%s' (ID: %s) was quoted without a price. Skipping.",
+                candidate.product.name,
+                candidate.product.id,
+            )
+            metrics.inc("items_total", job="autolift", outcome="no_price")
+            continue
+        candidate.priority_status = priority_status
+        candidate.cost = priority_status["price"]
+        quoted.append(candidate)
+
+    if not quoted:
+        return
+
+    account_pk = getattr(playerok.credentials, "account_pk", None)
+    remaining = await spend_budget.remaining(account_pk)
+    planned, deferred = plan_autolifts(quoted, remaining)
+    logger.info(
+        "Autolift plan: %d of %d candidates, budget left: %s.",
+        len(planned),
+        len(quoted),
+        "unlimited" if remaining is None else remaining,
+    )
+
+    lifted, failed, spent = [], [], 0
+    for candidate in planned:
+        if playerok.unavailable:
+            logger.warning("Playerok became unavailable (circuit open), stopping autolift.")
+            metrics.inc("cycles_skipped_total", job="autolift", reason="circuit_open")
+            break
+
+        product = candidate.product
+        entry = await mutation_journal.begin(
+            product,
+            "autolift",
+            candidate.priority_status["id"],
+            account_pk=account_pk,
+            cost=candidate.cost,
+        )
+        transaction = await playerok.make_autolift(
+            product.id,
+            candidate.priority_status["id"],
+        )
+        await mutation_journal.finish(entry, journal_state(transaction))
+
+        if transaction:
+            logger.info(
+                "Product '%s' (ID: %s) autolifted successfully.",
+                product.name,
+                product.id,
+            )
+            metrics.inc("items_total", job="autolift", outcome="mutated")
+            await spend_budget.record(account_pk, product.id, "autolift", candidate.cost)
+            lifted.append(candidate)
+            spent += candidate.cost
+        else:
+            metrics.inc("items_total", job="autolift", outcome="failed")
+            logger.warning(
+                "Failed to autolift product '%s' (ID: %s).",
+                product.name,
+                product.id,
+            )
+            failed.append(candidate)
+
+    metrics.inc("items_total", len(deferred), job="autolift", outcome="deferred")
+
+    # a budget that stays exhausted defers the same items every cycle
+    deferred_ids = {candidate.product.id for candidate in deferred}
+    if not lifted and not failed and deferred_ids == _deferred_notified.get(account_pk):
+        return
+    _deferred_notified[account_pk] = deferred_ids
+
+    with metrics.phase("notify"):
+        notifier.notify_text(
+            admin_ids,
+            autolift_summary(
+                playerok, quoted, lifted, failed, deferred, spent, remaining
+            ),
+        )
+
+
+def autolift_summary(
+    playerok: Playerok,
+    quoted: list,
+    lifted: list,
+    failed: list,
+    deferred: list,
+    spent: int,
+    remaining,
+) -> str:
+    budget_left = "без ліміту" if remaining is None else remaining - spent
+    message_text = (
+        f"📈 <b>Автопідняття: {playerok.credentials.username}</b>\n"
+        f"Кандидатів: {len(quoted)}, піднято: {len(lifted)}, "
+        f"відкладено: {len(deferred)}, помилок: {len(failed)}\n"
+        f"Витрачено: {spent}, залишок бюджету: {budget_left}\n"
+    )
+
+    for title, group in (("ТОВАР ПІДНЯТИЙ В ТОП", lifted), ("Відкладено", deferred)):
+        if not group:
+            continue
+        message_text += f"\n<b>{title}</b>\n"
+        for candidate in group[:SUMMARY_ITEMS]:
+            product = candidate.product
+            message_text += (
+                f'• <a href="{site_url}/products/{product.slug}">{html.escape(product.name)}</a>: '
+                f"{candidate.sequence} → {candidate.target}, ціна {candidate.cost}\n"
+            )
+        if len(group) > SUMMARY_ITEMS:
+            message_text += f"… і ще {len(group) - SUMMARY_ITEMS}\n"
+
+    return message_text
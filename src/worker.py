@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import socket
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+
+from database import create_db
+from accounts import pool
+from ledger import ledger
+from notifier import notifier
+from keywords import parser_keyword_store, autolift_keyword_store
+from utils import reupload_products, autolift_products
+from workqueue import work_queue
+from metrics import metrics
+from logconfig import setup_logging
+from jobs import admin_ids
+from config import (
+    token,
+    worker_concurrency,
+    worker_poll_interval,
+    metrics_host,
+    worker_metrics_port,
+)
+
+# Run with DISTRIBUTED_JOBS=true in the bot process and start any number of
+# `python worker.py` processes against the same DB_URL.
+
+os.makedirs("logs", exist_ok=True)
+
+# a rotating file can't be shared between processes, every worker
+# writes and rotates its own
+log_listener = setup_logging(f"logs/worker-{os.getpid()}.log")
+logger = logging.getLogger(__name__)
+
+# workers on one host take the next free port from WORKER_METRICS_PORT
+METRICS_PORTS = 32
+
+WORK = {
+    "reupload": (reupload_products, parser_keyword_store),
+    "autolift": (autolift_products, autolift_keyword_store),
+}
+
+
+async def keep_lease(unit_pk: int, owner: str):
+    while True:
+        await asyncio.sleep(work_queue.lease.total_seconds() / 3)
+        try:
+            renewed = await work_queue.renew(unit_pk, owner)
+        except Exception as e:
+            # the lease outlives a few renewals, try again on the next one
+            logger.error(f"Failed to renew the lease on work unit {unit_pk}: {e}")
+            continue
+        if not renewed:
+            logger.warning(f"Lost the lease on work unit {unit_pk}")
+            return
+
+
+async def run_unit(unit, owner: str):
+    func, keywords = WORK[unit.kind]
+    playerok = await pool.sync(unit.account_pk)
+    if not playerok:
+        await work_queue.complete(unit.pk, owner, "failed", "account not found")
+        return
+
+    # keywords and the ledger are written by other processes
+    keywords.invalidate()
+    await ledger.sync()
+
+    logger.info(f"Running work unit {unit.pk} ({unit.kind}, account {unit.account_pk})")
+    lease = asyncio.create_task(keep_lease(unit.pk, owner))
+    try:
+        processed = await func(playerok, keywords, notifier, admin_ids())
+    finally:
+        lease.cancel()
+
+    # the jobs return None only when the cycle raised, skipped cycles give 0
+    if processed is None:
+        await work_queue.complete(unit.pk, owner, "failed", "see worker log")
+    else:
+        await work_queue.complete(unit.pk, owner, "done", f"processed {processed}")
+
+
+async def work(owner: str):
+    while True:
+        try:
+            unit = await work_queue.claim(owner)
+        except Exception as e:
+            # the database restarted or stayed locked, don't take the
+            # whole worker down with this slot
+            logger.error(f"Failed to claim a work unit: {e}", exc_info=True)
+            await asyncio.sleep(worker_poll_interval)
+            continue
+        if not unit:
+            await asyncio.sleep(worker_poll_interval)
+            continue
+
+        try:
+            await run_unit(unit, owner)
+        except Exception as e:
+            logger.error(f"Work unit {unit.pk} failed: {e}", exc_info=True)
+            try:
+                await work_queue.complete(unit.pk, owner, "failed", str(e))
+            except Exception as e:
+                # the lease expires and the unit is claimed again
+                logger.error(f"Failed to complete work unit {unit.pk}: {e}")
+
+
+async def purge():
+    while True:
+        try:
+            await work_queue.purge()
+        except Exception as e:
+            logger.error(f"Failed to purge finished work units: {e}")
+        await asyncio.sleep(3600)
+
+
+async def main():
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+    await create_db()
+    await pool.load()
+    notifier.start(bot)
+    await metrics.start_exporter(metrics_host, worker_metrics_port, METRICS_PORTS)
+    logger.info(f"Worker {owner} started with {worker_concurrency} slots")
+
+    try:
+        await asyncio.gather(
+            purge(), *(work(f"{owner}/{slot}") for slot in range(worker_concurrency))
+        )
+    finally:
+        await notifier.stop()
+        await metrics.stop_exporter()
+        await bot.session.close()
+        logger.info(f"Worker {owner} down")
+        log_listener.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
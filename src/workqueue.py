@@ -0,0 +1,190 @@
+import logging
+
+import database as db
+
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, and_, or_, exists
+from sqlalchemy.orm import aliased
+from database import session_maker
+from metrics import metrics
+from config import work_lease_seconds, work_max_attempts
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """
+    Durable queue of work units in the work_unit table. The bot process
+    enqueues one unit per account and job kind, worker processes claim
+    units with a lease and write the result back. A unit whose lease has
+    expired (the worker died) is claimed again, up to max_attempts times.
+
+    Claims are conditional UPDATEs, so any number of workers can share one
+    SQLite or Postgres database without extra locking.
+
+    The rate budgets of an account live in the process that runs it, so
+    all running units of one account are kept in one worker process: a
+    unit is not claimed while another process holds a live lease on the
+    same account. Owners are "<process>/<slot>".
+    """
+
+    def __init__(self, lease_seconds: float, max_attempts: int):
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+
+    def _claimable(self, now: datetime):
+        return or_(
+            db.WorkUnit.status == "pending",
+            and_(
+                db.WorkUnit.status == "running",
+                db.WorkUnit.lease_until < now,
+                db.WorkUnit.attempts < self.max_attempts,
+            ),
+        )
+
+    def _leased_elsewhere(self, unit, now: datetime, process: str):
+        # a live lease on the unit's account held by another process
+        other = aliased(db.WorkUnit)
+        return exists().where(
+            other.account_pk == unit.account_pk,
+            other.pk != unit.pk,
+            other.status == "running",
+            other.lease_until >= now,
+            ~other.lease_owner.startswith(f"{process}/", autoescape=True),
+        )
+
+    async def enqueue(self, account_pk: int, kind: str):
+        now = datetime.utcnow()
+        async with session_maker() as session:
+            active = await session.scalar(
+                select(db.WorkUnit.pk).where(
+                    db.WorkUnit.account_pk == account_pk,
+                    db.WorkUnit.kind == kind,
+                    or_(
+                        db.WorkUnit.status == "pending",
+                        and_(
+                            db.WorkUnit.status == "running",
+                            db.WorkUnit.lease_until >= now,
+                        ),
+                    ),
+                )
+            )
+            if active:
+                logger.warning(
+                    f"Work unit {active} ({kind}, account {account_pk}) "
+                    "is still queued, tick skipped"
+                )
+                metrics.inc("cycles_skipped_total", job=kind, reason="queued")
+                return None
+
+            unit = db.WorkUnit(account_pk=account_pk, kind=kind, status="pending")
+            session.add(unit)
+            await session.commit()
+            return unit
+
+    async def claim(self, owner: str):
+        now = datetime.utcnow()
+        process = owner.rsplit("/", 1)[0]
+        free = ~self._leased_elsewhere(db.WorkUnit, now, process)
+        async with session_maker() as session:
+            await self._fail_exhausted(session, now)
+
+            candidates = (
+                await session.scalars(
+                    select(db.WorkUnit.pk)
+                    .where(self._claimable(now), free)
+                    .order_by(db.WorkUnit.pk)
+                    .limit(5)
+                )
+            ).all()
+
+            for pk in candidates:
+                # another worker may have taken the unit since the select
+                result = await session.execute(
+                    update(db.WorkUnit)
+                    .where(db.WorkUnit.pk == pk, self._claimable(now), free)
+                    .values(
+                        status="running",
+                        lease_owner=owner,
+                        lease_until=now + self.lease,
+                        attempts=db.WorkUnit.attempts + 1,
+                    )
+                )
+                await session.commit()
+                if result.rowcount != 1:
+                    continue
+
+                # two processes may have claimed units of the same account
+                # at once; whoever sees the other after its own commit backs
+                # off, so at most one of them runs
+                unit = await session.get(db.WorkUnit, pk)
+                if await session.scalar(
+                    select(self._leased_elsewhere(unit, now, process))
+                ):
+                    await session.execute(
+                        update(db.WorkUnit)
+                        .where(db.WorkUnit.pk == pk, db.WorkUnit.lease_owner == owner)
+                        .values(
+                            status="pending",
+                            lease_owner=None,
+                            lease_until=None,
+                            attempts=db.WorkUnit.attempts - 1,
+                        )
+                    )
+                    await session.commit()
+                    continue
+                return unit
+
+        return None
+
+    async def _fail_exhausted(self, session, now: datetime):
+        await session.execute(
+            update(db.WorkUnit)
+            .where(
+                db.WorkUnit.status == "running",
+                db.WorkUnit.lease_until < now,
+                db.WorkUnit.attempts >= self.max_attempts,
+            )
+            .values(status="failed", result="lease expired", finished=now)
+        )
+        await session.commit()
+
+    async def renew(self, pk: int, owner: str) -> bool:
+        async with session_maker() as session:
+            result = await session.execute(
+                update(db.WorkUnit)
+                .where(
+                    db.WorkUnit.pk == pk,
+                    db.WorkUnit.lease_owner == owner,
+                    db.WorkUnit.status == "running",
+                )
+                .values(lease_until=datetime.utcnow() + self.lease)
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def complete(self, pk: int, owner: str, status: str, result: str = None):
+        async with session_maker() as session:
+            await session.execute(
+                update(db.WorkUnit)
+                .where(db.WorkUnit.pk == pk, db.WorkUnit.lease_owner == owner)
+                .values(
+                    status=status,
+                    result=result[:255] if result else None,
+                    finished=datetime.utcnow(),
+                )
+            )
+            await session.commit()
+
+    async def purge(self, older_than: timedelta = timedelta(days=1)):
+        async with session_maker() as session:
+            await session.execute(
+                delete(db.WorkUnit).where(
+                    db.WorkUnit.status.in_(("done", "failed")),
+                    db.WorkUnit.finished < datetime.utcnow() - older_than,
+                )
+            )
+            await session.commit()
+
+
+work_queue = WorkQueue(work_lease_seconds, work_max_attempts)